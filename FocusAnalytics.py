@@ -0,0 +1,376 @@
+# Description: Streaming analytics over archived FocusGame records (FocusRecord.py). Games are replayed move by move
+#              through the engine in worker processes, registered feature extractors score every move, and the
+#              results are totalled as they arrive, so memory use doesn't depend on the size of the archive.
+#
+# A feature extractor is a function (game, move, mover, before, after) -> number or None (not scored), called after
+# each move is made. mover is 0 or 1 for the player who moved, before and after are move_counts() of the position
+# before and after the move. Register it with register_feature(name, function); it must be defined at module level
+# so it can be sent to the worker processes.
+#
+# A follow query (first, then, within) counts the moves where feature first is nonzero, and how many of them are
+# followed within the next `within` moves by a move where feature then is nonzero. For example
+# ('reserve_drop', 'captured', 3): how often does a reserve drop lead to a capture within 3 moves.
+#
+# Usage: python -m FocusAnalytics games.focus --workers 8 --follow reserve_drop,captured,3
+#        python -m FocusAnalytics games.focus --features captured,stack_height --variant cross
+
+import argparse
+import collections
+import json
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from FocusGame import FocusGame, VARIANTS, MOVED, WON
+from FocusRecord import record_variant, scan_records
+
+MAX_VALUES = 256  # Most distinct values counted per feature, later new values are only counted as 'other'
+
+
+def move_counts(game):
+    """
+    Function move_counts, the per-player counts feature extractors compare before and after a move
+    :return: ((reserve, captured, controlled stacks) of the first player, the same for the second player)
+    """
+    counts = []
+    for name, color in game.get_players():
+        counts.append((game.show_reserve(name), game.show_captured(name), game.show_controlled(name)))
+    return tuple(counts)
+
+
+def stack_height(game, move, mover, before, after):
+    """Height of the stack the move landed on, after any pieces over the stack limit were removed"""
+    return len(game.show_pieces(move[0] if len(move) == 1 else move[1]))
+
+
+def tallest_stack(game, move, mover, before, after):
+    """Height of the tallest stack on the board after the move. Scans the board, so it isn't registered by default."""
+    return max(len(game.show_pieces(coords)) for coords in game.get_variant().cells)
+
+
+def captured(game, move, mover, before, after):
+    """Pieces the mover captured with the move (show_captured delta)"""
+    return after[mover][1] - before[mover][1]
+
+
+def reserved(game, move, mover, before, after):
+    """Change in the mover's reserve (show_reserve delta): -1 for a reserve drop, plus pieces sent to reserve"""
+    return after[mover][0] - before[mover][0]
+
+
+def reserve_drop(game, move, mover, before, after):
+    """1 for a reserve move, 0 for a stack move"""
+    return 1 if len(move) == 1 else 0
+
+
+def control(game, move, mover, before, after):
+    """Stacks topped by the mover's piece minus stacks topped by the opponent's, after the move"""
+    return after[mover][2] - after[1 - mover][2]
+
+
+def control_change(game, move, mover, before, after):
+    """Change in the mover's control margin (see control) made by the move"""
+    return after[mover][2] - after[1 - mover][2] - (before[mover][2] - before[1 - mover][2])
+
+
+FEATURES = {}  # Feature name: extractor function, analyze() scores all of them unless given its own
+
+
+def register_feature(name, function):
+    """
+    Function register_feature, adds a feature extractor to FEATURES, replacing any with the same name
+    :param function: Module-level function (game, move, mover, before, after) -> number or None
+    """
+    FEATURES[name] = function
+
+
+for _function in (stack_height, captured, reserved, reserve_drop, control, control_change):
+    register_feature(_function.__name__, _function)
+
+
+class FeatureTotals:
+    """
+    Class definition for the running totals of one feature: count, sum, smallest and largest value, and how often
+    each value occurred
+    """
+    def __init__(self):
+        """
+        _values: Dictionary of value: number of moves, at most MAX_VALUES entries
+        _other: Number of moves whose value didn't fit in _values
+        """
+        self._count = 0
+        self._sum = 0
+        self._min = None
+        self._max = None
+        self._values = {}
+        self._other = 0
+
+    def add(self, value):
+        """Method add, counts one move's value"""
+        self._count += 1
+        self._sum += value
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+        if value in self._values:
+            self._values[value] += 1
+        else:
+            self.add_value(value, 1)
+
+    def add_extremes(self, smallest, largest):
+        """Method add_extremes, widens the smallest and largest value seen"""
+        if self._min is None or smallest < self._min:
+            self._min = smallest
+        if self._max is None or largest > self._max:
+            self._max = largest
+
+    def add_value(self, value, count):
+        """Method add_value, adds count moves to a value's tally, or to 'other' once MAX_VALUES values are tallied"""
+        if value in self._values or len(self._values) < MAX_VALUES:
+            self._values[value] = self._values.get(value, 0) + count
+        else:
+            self._other += count
+
+    def merge(self, other):
+        """Method merge, adds the totals of another FeatureTotals to these"""
+        self._count += other._count
+        self._sum += other._sum
+        if other._count:
+            self.add_extremes(other._min, other._max)
+        for value, count in other._values.items():
+            self.add_value(value, count)
+        self._other += other._other
+
+    def snapshot(self):
+        """
+        Method snapshot
+        :return: Dictionary of count, sum, mean, min, max, values ({value: moves}) and other
+        """
+        return {'count': self._count, 'sum': self._sum, 'mean': self._sum / self._count if self._count else 0.0,
+                'min': self._min, 'max': self._max, 'values': dict(sorted(self._values.items())),
+                'other': self._other}
+
+
+class Summary:
+    """
+    Class definition for the totals of an analysis. Each work unit builds its own Summary, and the parent
+    process merges them as they finish.
+    """
+    def __init__(self, features, follows=()):
+        """
+        :param features: Feature names
+        :param follows: Follow queries, (first feature, then feature, within moves) tuples
+        _features: Dictionary of feature name: FeatureTotals
+        _follows: Dictionary of follow query: [moves where first is nonzero, how many were followed by then]
+        """
+        self._games = 0
+        self._moves = 0
+        self._rejected = 0
+        self._skipped = 0  # Games recorded on another variant than the one being analyzed
+        self._features = {name: FeatureTotals() for name in features}
+        self._follows = {tuple(query): [0, 0] for query in follows}
+
+    def count_game(self, moves, rejected):
+        """Method count_game, counts one replayed game and its moves, rejected is True if it hit an illegal move"""
+        self._games += 1
+        self._moves += moves
+        self._rejected += 1 if rejected else 0
+
+    def count_skipped(self):
+        """Method count_skipped, counts a game left out because it was recorded on another variant"""
+        self._skipped += 1
+
+    def add_row(self, row):
+        """Method add_row, adds one move's feature values (dictionary of name: value, None if not scored)"""
+        for name, value in row.items():
+            if value is not None:
+                self._features[name].add(value)
+
+    def get_follows(self):
+        """Get method to return the follow queries, (first, then, within) tuples"""
+        return tuple(self._follows)
+
+    def count_follow(self, query, events, hits):
+        """Method count_follow, adds to a follow query's totals"""
+        self._follows[query][0] += events
+        self._follows[query][1] += hits
+
+    def merge(self, other):
+        """Method merge, adds another Summary of the same features and follow queries to this one"""
+        self._games += other._games
+        self._moves += other._moves
+        self._rejected += other._rejected
+        self._skipped += other._skipped
+        for name, totals in other._features.items():
+            self._features[name].merge(totals)
+        for query, (events, hits) in other._follows.items():
+            self.count_follow(query, events, hits)
+
+    def snapshot(self):
+        """
+        Method snapshot, returns everything totalled so far
+        :return: Dictionary of games, moves, rejected games, skipped games (not counted in games), features
+                 ({name: FeatureTotals snapshot}) and follows ({'first->then within N': {'events', 'hits', 'rate'}})
+        """
+        follows = {}
+        for (first, then, within), (events, hits) in self._follows.items():
+            follows['%s->%s within %d' % (first, then, within)] = \
+                {'events': events, 'hits': hits, 'rate': hits / events if events else 0.0}
+        return {'games': self._games, 'moves': self._moves, 'rejected': self._rejected, 'skipped': self._skipped,
+                'features': {name: totals.snapshot() for name, totals in self._features.items()},
+                'follows': follows}
+
+
+def replay_rows(tuple_1, tuple_2, words, features, variant=None):
+    """
+    Generator replay_rows, replays a recorded game lazily with try_move(), scoring each move as it is made
+    :param words: Move words of the game, as stored in the record
+    :param features: Dictionary of feature name: extractor function
+    :param variant: BoardVariant the game was played on, default standard
+    :return: Yields (mover, move, row: dictionary of feature name: value) per move. Stops at the first move the
+             engine rejects, after yielding (mover, None, None) for it.
+    """
+    game = FocusGame(tuple_1, tuple_2, variant)
+    table, before = game.get_variant().words, move_counts(game)
+    for word in words:
+        mover = 0 if game.get_turn() == tuple_1 else 1
+        if game.try_move(word) not in (MOVED, WON):
+            yield mover, None, None
+            return
+        after, move = move_counts(game), table[word]
+        yield mover, move, {name: function(game, move, mover, before, after) for name, function in features.items()}
+        before = after
+
+
+def analyze_game(tuple_1, tuple_2, words, features, summary, variant=None):
+    """
+    Function analyze_game, replays one game into a Summary, including its follow queries. Only the last `within`
+    moves of each follow query are kept while the game is replayed.
+    """
+    pending = {query: collections.deque() for query in summary.get_follows()}  # Moves still waiting for "then"
+    moves, rejected = 0, False
+    for number, (mover, move, row) in enumerate(replay_rows(tuple_1, tuple_2, words, features, variant)):
+        if move is None:
+            rejected = True
+            break
+        moves += 1
+        summary.add_row(row)
+        for (first, then, within), waiting in pending.items():
+            while waiting and waiting[0] < number - within:
+                waiting.popleft()  # No longer within reach
+            hits = len(waiting) if row[then] else 0
+            if hits:
+                waiting.clear()
+            if row[first]:
+                waiting.append(number)
+            summary.count_follow((first, then, within), 1 if row[first] else 0, hits)
+    summary.count_game(moves, rejected)
+
+
+def analyze_chunk(games, features, follows, variant):
+    """
+    Function analyze_chunk, the work unit run by each worker process
+    :param games: List of (tuple_1, tuple_2, BoardVariant of the record, move words as bytes)
+    :param variant: BoardVariant to replay on, None for the variant each record stores
+    :return: Summary of the games, the only thing sent back to the parent process
+    """
+    summary = Summary(features, follows)
+    for tuple_1, tuple_2, recorded, data in games:
+        try:
+            game_variant = record_variant(recorded, variant)
+        except ValueError:
+            summary.count_skipped()  # Its moves would mean something else on this board
+            continue
+        words = struct.unpack('>%dH' % (len(data) // 2), data)
+        analyze_game(tuple_1, tuple_2, words, features, summary, game_variant)
+    return summary
+
+
+def archive_chunks(path, chunk_size):
+    """
+    Generator archive_chunks, reads a record file through a memory map and yields its games in lists of
+    chunk_size (tuple_1, tuple_2, BoardVariant, move words as bytes). The moves are left encoded for the workers.
+    """
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            records, chunk = scan_records(buffer), []
+            try:
+                for tuple_1, tuple_2, recorded, words in records:
+                    chunk.append((tuple_1, tuple_2, recorded, bytes(words)))
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+            finally:
+                records.close()
+            if chunk:
+                yield chunk
+
+
+def analyze_chunks(path, features=None, follows=(), workers=None, chunk_size=200, variant=None):
+    """
+    Generator analyze_chunks, replays every game of a record file across a process pool and yields the Summary of
+    each work unit as it finishes. At most two chunks per worker are queued at a time, so memory stays bounded.
+    :param path: Record file written by FocusRecord.GameRecordWriter
+    :param features: Dictionary of feature name: extractor function, defaults to FEATURES
+    :param follows: Follow queries, (first feature, then feature, within moves) tuples
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :param chunk_size: Number of games per work unit
+    :param variant: BoardVariant to replay on, defaults to the variant each record stores. Only needed for
+                    version 1 records, which store just the board size; records it doesn't fit are skipped.
+    """
+    features = dict(FEATURES if features is None else features)
+    for first, then, within in follows:
+        if first not in features or then not in features:
+            raise ValueError('follow query %r uses a feature that is not scored' % ((first, then, within),))
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in archive_chunks(path, chunk_size):
+            pending.add(executor.submit(analyze_chunk, chunk, features, follows, variant))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+def analyze(path, features=None, follows=(), workers=None, chunk_size=200, variant=None):
+    """
+    Function analyze, runs analyze_chunks() and merges the work units' summaries as they arrive
+    :return: Summary of the whole archive, see Summary.snapshot()
+    """
+    features = dict(FEATURES if features is None else features)
+    total = Summary(features, follows)
+    for summary in analyze_chunks(path, features, follows, workers, chunk_size, variant):
+        total.merge(summary)
+    return total
+
+
+def main(argv=None):
+    """Command line entry point, prints the summary as JSON"""
+    parser = argparse.ArgumentParser(description='Replay archived FocusGame records and total per-move features.')
+    parser.add_argument('path', help='record file written by FocusRecord.GameRecordWriter')
+    parser.add_argument('--features', default=None, help='comma separated features (default: all registered)')
+    parser.add_argument('--follow', action='append', default=[], help='follow query first,then,within (repeatable)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=200, help='games per work unit')
+    parser.add_argument('--variant', default=None, choices=sorted(VARIANTS),
+                        help='board the games used (default: the one each record stores)')
+    args = parser.parse_args(argv)
+    features = None if args.features is None else {name: FEATURES[name] for name in args.features.split(',')}
+    follows = [(first, then, int(within)) for first, then, within in (query.split(',') for query in args.follow)]
+    start = time.perf_counter()
+    variant = None if args.variant is None else VARIANTS[args.variant]
+    snapshot = analyze(args.path, features, follows, args.workers, args.chunk_size, variant).snapshot()
+    elapsed = time.perf_counter() - start
+    print(json.dumps(snapshot, indent=2))
+    print('%d games, %d moves in %.2fs: %.0f moves/sec' % (snapshot['games'], snapshot['moves'], elapsed,
+                                                            snapshot['moves'] / elapsed if elapsed else 0.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+# Description: Batched FocusGame engine. Holds many games as NumPy arrays and makes one move in every game per step,
+#              with validation, stack overflow handling and win checks done on whole arrays at once.
+#              Requires NumPy. Pieces are tracked by player index (0 = first player, 1 = second player), so the two
+#              players are assumed to have different colors.
+
+import time
+
+import numpy as np
+
+from FocusGame import FocusGame
+
+BOARD_SIZE = 6
+CELLS = BOARD_SIZE * BOARD_SIZE
+MAX_STACK = 5
+UNFINISHED = -1  # Winner value of a game still being played
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))  # Names and colors used when replaying games through FocusGame
+POPCOUNT = np.array([bin(value).count('1') for value in range(1 << (2 * MAX_STACK))], dtype=np.int16)
+
+
+def make_candidates():
+    """
+    Function make_candidates, lists every move that stays on the board: (from, to, num_pieces) for single and
+    multiple moves, and (-1, to, 1) for reserve moves. Cells are numbered row * 6 + column.
+    :return: int16 array of shape (number of candidates, 3)
+    """
+    rows = []
+    for cell in range(CELLS):
+        row, column = divmod(cell, BOARD_SIZE)
+        for num_pieces in range(1, MAX_STACK + 1):
+            for row_to, column_to in ((row - num_pieces, column), (row + num_pieces, column),
+                                      (row, column - num_pieces), (row, column + num_pieces)):
+                if 0 <= row_to < BOARD_SIZE and 0 <= column_to < BOARD_SIZE:
+                    rows.append((cell, row_to * BOARD_SIZE + column_to, num_pieces))
+    rows.extend((-1, cell, 1) for cell in range(CELLS))
+    return np.array(rows, dtype=np.int16)
+
+
+CANDIDATES = make_candidates()
+
+
+class BatchFocusGame:
+    """
+    Class definition for num_games FocusGames played in lockstep. Every array has one row per game:
+    _heights: (num_games, 36) stack heights
+    _stacks: (num_games, 36) piece owner bits, bottom piece in bit 0
+    _reserve / _captured: (num_games, 2) counts per player
+    _turn: (num_games,) index of the player to move
+    _winner: (num_games,) index of the winning player, or UNFINISHED
+    """
+    def __init__(self, num_games):
+        """
+        Special method __init__, sets every game up in the FocusGame starting position
+        :param num_games: Number of games to hold
+        """
+        owners = [((column // 2) % 2) ^ (row % 2) for row in range(BOARD_SIZE) for column in range(BOARD_SIZE)]
+        self._heights = np.ones((num_games, CELLS), dtype=np.uint8)
+        self._stacks = np.tile(np.array(owners, dtype=np.uint8), (num_games, 1))
+        self._reserve = np.zeros((num_games, 2), dtype=np.int16)
+        self._captured = np.zeros((num_games, 2), dtype=np.int16)
+        self._turn = np.zeros(num_games, dtype=np.int16)
+        self._winner = np.full(num_games, UNFINISHED, dtype=np.int8)
+        self._games = np.arange(num_games)
+
+    def unfinished(self):
+        """Returns a boolean array, True for games still being played"""
+        return self._winner == UNFINISHED
+
+    def top_owners(self, heights, stacks):
+        """Returns the owner of the top piece of each stack (meaningless where the height is 0)"""
+        return (stacks >> np.maximum(heights.astype(np.int16) - 1, 0)) & 1
+
+    def validate(self, cell_from, cell_to, num_pieces):
+        """
+        Method validate, checks one move per game for the player to move, the same checks FocusGame.validate_move
+        makes. A cell_from below 0 means a reserve move.
+        :param cell_from: int array of FROM cells (row * 6 + column), -1 for reserve moves
+        :param cell_to: int array of TO cells
+        :param num_pieces: int array of number of pieces to move
+        :return: Boolean array, True where the move is valid
+        """
+        index_from, index_to = np.clip(cell_from, 0, CELLS - 1), np.clip(cell_to, 0, CELLS - 1)
+        height = self._heights[self._games, index_from].astype(np.int16)
+        top = self.top_owners(height, self._stacks[self._games, index_from])
+        row_from, column_from = np.divmod(index_from, BOARD_SIZE)
+        row_to, column_to = np.divmod(index_to, BOARD_SIZE)
+        straight = (row_from == row_to) | (column_from == column_to)
+        distance = np.abs(row_from - row_to) + np.abs(column_from - column_to)
+        move_ok = (cell_from < CELLS) & (cell_from != cell_to) & (height > 0) & (top == self._turn) & straight & \
+            (distance == num_pieces) & (num_pieces >= 1) & (num_pieces <= height)
+        reserve_ok = self._reserve[self._games, self._turn] > 0
+        return self.unfinished() & (cell_to >= 0) & (cell_to < CELLS) & np.where(cell_from < 0, reserve_ok, move_ok)
+
+    def step(self, cell_from, cell_to, num_pieces):
+        """
+        Method step, makes one move in every game where it is valid, then checks those games for a win.
+        Games with an invalid move are left unchanged, as move_piece() would leave them.
+        :return: Boolean array, True where the move was made
+        """
+        cell_from, cell_to, num_pieces = (np.asarray(array, dtype=np.int16) for array in
+                                          (cell_from, cell_to, num_pieces))
+        valid = self.validate(cell_from, cell_to, num_pieces)
+        games = self._games[valid]
+        moved = self.take_pieces(games, cell_from[valid], num_pieces[valid])
+        self.place_pieces(games, cell_to[valid], num_pieces[valid], moved)
+        self.win_check(games)
+        self._turn[games] ^= 1
+        return valid
+
+    def take_pieces(self, games, cell_from, num_pieces):
+        """
+        Method take_pieces, removes the top num_pieces from the FROM stacks, or one piece from the reserve
+        :return: Owner bits of the pieces taken, bottom piece first
+        """
+        reserve = cell_from < 0
+        turn = self._turn[games]
+        self._reserve[games[reserve], turn[reserve]] -= 1
+        stack_games, cells, counts = games[~reserve], cell_from[~reserve], num_pieces[~reserve]
+        heights = self._heights[stack_games, cells].astype(np.int16)
+        stacks = self._stacks[stack_games, cells].astype(np.int16)
+        remaining = heights - counts
+        self._heights[stack_games, cells] = remaining
+        self._stacks[stack_games, cells] = stacks & ((1 << remaining) - 1)
+        moved = turn.copy()  # A reserve piece belongs to the player to move
+        moved[~reserve] = stacks >> remaining
+        return moved
+
+    def place_pieces(self, games, cell_to, num_pieces, moved):
+        """
+        Method place_pieces, puts the moved pieces on top of the TO stacks and trims stacks taller than 5 from the
+        bottom, the same way FocusGame.check_stack and to_reserve do: the mover's own pieces go to their reserve,
+        the opponent's are captured.
+        """
+        heights = self._heights[games, cell_to].astype(np.int16)
+        combined = self._stacks[games, cell_to].astype(np.int16) | (moved << heights)
+        heights += num_pieces
+        extra = np.maximum(heights - MAX_STACK, 0)
+        removed_ones = POPCOUNT[combined & ((1 << extra) - 1)]
+        turn = self._turn[games]
+        own = np.where(turn == 1, removed_ones, extra - removed_ones)
+        self._reserve[games, turn] += own
+        self._captured[games, turn] += extra - own
+        self._heights[games, cell_to] = heights - extra
+        self._stacks[games, cell_to] = combined >> extra
+
+    def win_check(self, games):
+        """
+        Method win_check, the same two win conditions as FocusGame.win_check for the player who just moved:
+        more than 5 captured pieces, or the other player has no stack topped by their piece and no reserve.
+        """
+        turn = self._turn[games]
+        heights = self._heights[games]
+        tops = self.top_owners(heights, self._stacks[games])
+        no_stacks = np.all((heights == 0) | (tops == turn[:, None]), axis=1)
+        won = (self._captured[games, turn] > 5) | (no_stacks & (self._reserve[games, 1 - turn] == 0))
+        self._winner[games[won]] = turn[won]
+
+    def random_moves(self, rng):
+        """
+        Method random_moves, picks a random legal move for the player to move in every game
+        :param rng: numpy.random.Generator
+        :return: (cell_from, cell_to, num_pieces) arrays; games with no legal move get cell_to = -1
+        """
+        cell_from, cell_to, num_pieces = CANDIDATES[:, 0], CANDIDATES[:, 1], CANDIDATES[:, 2]
+        index_from = np.maximum(cell_from, 0)
+        heights = self._heights[:, index_from]
+        tops = self.top_owners(heights, self._stacks[:, index_from])
+        legal = (heights >= num_pieces) & (tops == self._turn[:, None])
+        has_reserve = self._reserve[self._games, self._turn] > 0
+        legal = np.where(cell_from < 0, has_reserve[:, None], legal)
+        choice = np.argmax(rng.random(legal.shape) * legal, axis=1)
+        stuck = ~legal.any(axis=1)
+        return cell_from[choice], np.where(stuck, -1, cell_to[choice]), num_pieces[choice]
+
+    def show_pieces(self, game, coords):
+        """Returns the colors of the pieces at coords in one game, bottom-most piece at the 0th index"""
+        cell = coords[0] * BOARD_SIZE + coords[1]
+        height, stack = int(self._heights[game, cell]), int(self._stacks[game, cell])
+        return [PLAYERS[(stack >> level) & 1][1] for level in range(height)]
+
+    def show_reserve(self, game, player_index):
+        """Returns the reserve count of a player in one game"""
+        return int(self._reserve[game, player_index])
+
+    def show_captured(self, game, player_index):
+        """Returns the captured count of a player in one game"""
+        return int(self._captured[game, player_index])
+
+    def get_winner(self, game):
+        """Returns the index of the winning player of one game, or UNFINISHED"""
+        return int(self._winner[game])
+
+
+def cross_check(batch, logs):
+    """
+    Function cross_check, replays games through the scalar FocusGame class and compares the final boards,
+    reserve and captured counts, and winners with the batch engine
+    :param batch: BatchFocusGame the games were played in
+    :param logs: Dictionary of game index: list of (cell_from, cell_to, num_pieces) moves made in that game
+    :return: List of game indexes where FocusGame disagreed with the batch engine (empty if all match)
+    """
+    mismatches = []
+    for game_index, moves in logs.items():
+        game = FocusGame(*PLAYERS)
+        statuses = [game.play_move(game.get_turn()[0], to_focus_move(move)) for move in moves]
+        same = False not in statuses and game_matches(batch, game_index, game)
+        if not same:
+            mismatches.append(game_index)
+    return mismatches
+
+
+def to_focus_move(move):
+    """Converts a (cell_from, cell_to, num_pieces) batch move to the form FocusGame.play_move takes"""
+    cell_from, cell_to, num_pieces = (int(value) for value in move)
+    tuple_to = divmod(cell_to, BOARD_SIZE)
+    if cell_from < 0:
+        return (tuple_to,)
+    return divmod(cell_from, BOARD_SIZE), tuple_to, num_pieces
+
+
+def game_matches(batch, game_index, game):
+    """Returns True if a FocusGame is in the same position as one game of the batch"""
+    for cell in range(CELLS):
+        coords = divmod(cell, BOARD_SIZE)
+        if list(game.show_pieces(coords)) != batch.show_pieces(game_index, coords):
+            return False
+    for index, (name, color) in enumerate(PLAYERS):
+        if game.show_reserve(name) != batch.show_reserve(game_index, index) or \
+                game.show_captured(name) != batch.show_captured(game_index, index):
+            return False
+    winner = batch.get_winner(game_index)
+    expected = "UNFINISHED" if winner == UNFINISHED else PLAYERS[winner][0] + ' Won'
+    return game.get_current_state() == expected
+
+
+def run_random_games(num_games, max_moves=1000, seed=0, check_sample=0):
+    """
+    Function run_random_games, plays num_games random games in lockstep until they all finish or max_moves
+    steps have been made
+    :param check_sample: Number of games to log and replay through FocusGame with cross_check()
+    :return: (BatchFocusGame, number of moves made, list of mismatching game indexes)
+    """
+    rng = np.random.default_rng(seed)
+    batch = BatchFocusGame(num_games)
+    logs = {int(index): [] for index in rng.choice(num_games, size=min(check_sample, num_games), replace=False)}
+    moves_made = 0
+    for step in range(max_moves):
+        if not batch.unfinished().any():
+            break
+        cell_from, cell_to, num_pieces = batch.random_moves(rng)
+        valid = batch.step(cell_from, cell_to, num_pieces)
+        moves_made += int(valid.sum())
+        for index, moves in logs.items():
+            if valid[index]:
+                moves.append((cell_from[index], cell_to[index], num_pieces[index]))
+    return batch, moves_made, cross_check(batch, logs)
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    batch, moves_made, mismatches = run_random_games(10000, max_moves=300, check_sample=100)
+    elapsed = time.perf_counter() - start
+    print('%d moves in %.2fs, %.0f moves/sec' % (moves_made, elapsed, moves_made / elapsed))
+    print('%d games finished, %d cross-check mismatches' % ((~batch.unfinished()).sum(), len(mismatches)))
@@ -0,0 +1,332 @@
+# Description: Benchmark suite for the hot paths of FocusGame.py. Every scenario uses fixed seeds, so two runs
+#              measure exactly the same work. Results are written as JSON and can be compared against a stored
+#              baseline, failing if any scenario got worse by more than a threshold.
+#
+# Usage: python -m FocusBenchmark                               (run and compare with FocusBenchmark.json)
+#        python -m FocusBenchmark --save-baseline               (run and store the results as the new baseline)
+#        python -m FocusBenchmark --output results.json --threshold 0.15
+# Baselines are only comparable on the same machine and Python version; save a new one after changing either.
+
+import argparse
+import json
+import platform
+import random
+import struct
+import sys
+import time
+import tracemalloc
+
+from FocusGame import FocusGame, VARIANTS, encode_move
+from FocusPositions import midgame_position
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+DEFAULT_BASELINE = 'FocusBenchmark.json'
+DEFAULT_THRESHOLD = 0.10  # A scenario more than 10% worse than the baseline is a regression
+
+
+def best_time(function, repeat):
+    """Returns the shortest of repeat calls to function(), in seconds. function() may return its own time."""
+    times = []
+    for index in range(repeat):
+        start = time.perf_counter()
+        elapsed = function()
+        times.append(elapsed if elapsed is not None else time.perf_counter() - start)
+    return min(times)
+
+
+def position(cells, reserve_1=0, reserve_2=0, turn=0):
+    """
+    Function position, builds a FocusGame with the given board
+    :param cells: 36 packed stacks, height | one owner bit per piece << 3 (the to_bytes() cell format)
+    """
+    header = FocusGame(*PLAYERS).to_bytes()[:-(len(cells) + 7)]
+    return FocusGame.from_bytes(header + struct.pack('7B', 6, turn, 0, reserve_1, 0, reserve_2, 0) + bytes(cells))
+
+
+def stack_moves(seed, num_moves):
+    """Returns the moves of a random game that only moves stacks, stopping early if it runs out of them"""
+    rng = random.Random(seed)
+    game = FocusGame(*PLAYERS)
+    moves = []
+    while len(moves) < num_moves and game.get_current_state() == "UNFINISHED":
+        choices = [move for move in game.legal_moves(game.get_turn()[0]) if len(move) == 3]
+        if choices == []:
+            break
+        moves.append(rng.choice(choices))
+        game.play_move(game.get_turn()[0], moves[-1])
+    return moves
+
+
+def bench_move_piece(repeat):
+    """move_piece calls per second, replaying fixed random games"""
+    games = [stack_moves(seed, 200) for seed in range(10)]
+    total = sum(len(moves) for moves in games)
+
+    def run():
+        elapsed = 0.0
+        for moves in games:
+            game = FocusGame(*PLAYERS)
+            player = ['PlayerA', 'PlayerB']
+            start = time.perf_counter()
+            for number, (tuple_from, tuple_to, num_pieces) in enumerate(moves):
+                game.move_piece(player[number % 2], tuple_from, tuple_to, num_pieces)
+            elapsed += time.perf_counter() - start
+        return elapsed
+    return total / best_time(run, repeat), 'moves/sec', 'higher'
+
+
+def invalid_moves(game, seed, count):
+    """Returns count random (player, tuple_from, tuple_to, num_pieces) moves that validate_move rejects"""
+    rng = random.Random(seed)
+    moves = []
+    while len(moves) < count:
+        move = (rng.choice(('PlayerA', 'PlayerB')), (rng.randint(-1, 6), rng.randint(-1, 6)),
+                (rng.randint(-1, 6), rng.randint(-1, 6)), rng.randint(1, 6))
+        if game.validate_move(*move) is False:
+            moves.append(move)
+    return moves
+
+
+def bench_invalid_moves(repeat):
+    """validate_move rejections per second, on a midgame position"""
+    game = midgame_position()
+    moves = invalid_moves(game, 1, 2000)
+
+    def run():
+        for move in moves:
+            game.validate_move(*move)
+    return len(moves) / best_time(run, repeat), 'rejections/sec', 'higher'
+
+
+def bench_try_move_invalid(repeat):
+    """try_move rejections per second, for the same moves as bench_invalid_moves"""
+    game = midgame_position()
+    moves = [(player, (tuple_from, tuple_to, num_pieces))
+             for player, tuple_from, tuple_to, num_pieces in invalid_moves(game, 1, 2000)]
+
+    def run():
+        for player, move in moves:
+            game.try_move(move, player)
+    return len(moves) / best_time(run, repeat), 'rejections/sec', 'higher'
+
+
+def mixed_workload(seed, num_moves, invalid_per_move=3):
+    """
+    Function mixed_workload, a fixed random game with invalid attempts before each move
+    :return: List of (player, tuple_from, tuple_to, num_pieces) attempts, replayed in order on a new game
+    """
+    rng = random.Random(seed)
+    game = FocusGame(*PLAYERS)
+    attempts = []
+    for tuple_from, tuple_to, num_pieces in stack_moves(seed, num_moves):
+        while len(attempts) % (invalid_per_move + 1) < invalid_per_move:
+            move = (rng.choice(('PlayerA', 'PlayerB')), (rng.randrange(6), rng.randrange(6)),
+                    (rng.randrange(6), rng.randrange(6)), rng.randint(1, 6))
+            if game.validate_move(*move) is not True:
+                attempts.append(move)
+        attempts.append((game.get_turn()[0], tuple_from, tuple_to, num_pieces))
+        game.move_piece(*attempts[-1])
+    return attempts
+
+
+def bench_mixed(repeat, use_try_move):
+    """Move attempts per second, 3 invalid to 1 valid, through move_piece or through try_move with move words"""
+    workloads = [mixed_workload(seed, 100) for seed in range(10)]
+    words = [[(player, encode_move((tuple_from, tuple_to, num_pieces))) for player, tuple_from, tuple_to, num_pieces
+              in attempts] for attempts in workloads]
+
+    def run():
+        elapsed = 0.0
+        for attempts, attempt_words in zip(workloads, words):
+            game = FocusGame(*PLAYERS)
+            start = time.perf_counter()
+            if use_try_move:
+                for player, word in attempt_words:
+                    game.try_move(word, player)
+            else:
+                for player, tuple_from, tuple_to, num_pieces in attempts:
+                    game.move_piece(player, tuple_from, tuple_to, num_pieces)
+            elapsed += time.perf_counter() - start
+        return elapsed
+    return sum(len(attempts) for attempts in workloads) / best_time(run, repeat), 'attempts/sec', 'higher'
+
+
+def bench_reserved_overflow(repeat):
+    """reserved_move calls per second onto full stacks, so every drop goes through check_stack and to_reserve"""
+    rng = random.Random(2)
+    game = position([5 | rng.randrange(32) << 3 for cell in range(36)], reserve_1=5, reserve_2=5)
+    targets = [(rng.randrange(6), rng.randrange(6)) for index in range(1000)]
+
+    def run():
+        elapsed = 0.0
+        for tuple_to in targets:
+            start = time.perf_counter()
+            game.reserved_move('PlayerA', tuple_to)
+            elapsed += time.perf_counter() - start
+            game.undo()  # Back to the same position, not timed
+        return elapsed
+    return len(targets) / best_time(run, repeat), 'moves/sec', 'higher'
+
+
+def bench_random_games(repeat, variant=None):
+    """Random games played to the end per second, picking moves from legal_moves"""
+    def run():
+        for seed in range(20):
+            rng = random.Random(seed)
+            game = FocusGame(*PLAYERS, variant)
+            for number in range(1000):
+                moves = list(game.legal_moves(game.get_turn()[0]))
+                if moves == []:
+                    break
+                game.play_move(game.get_turn()[0], rng.choice(moves))
+    return 20 / best_time(run, repeat), 'games/sec', 'higher'
+
+
+def bench_variant_moves(repeat, name):
+    """move_piece calls per second on a board variant, replaying one fixed random game per seed"""
+    games = []
+    for seed in range(5):
+        rng, game, moves = random.Random(seed), FocusGame(*PLAYERS, VARIANTS[name]), []
+        while len(moves) < 200 and game.get_current_state() == "UNFINISHED":
+            choices = [move for move in game.legal_moves(game.get_turn()[0]) if len(move) == 3]
+            if choices == []:
+                break
+            moves.append(rng.choice(choices))
+            game.play_move(game.get_turn()[0], moves[-1])
+        games.append(moves)
+
+    def run():
+        elapsed = 0.0
+        for moves in games:
+            game = FocusGame(*PLAYERS, VARIANTS[name])
+            start = time.perf_counter()
+            for number, (tuple_from, tuple_to, num_pieces) in enumerate(moves):
+                game.move_piece(('PlayerA', 'PlayerB')[number % 2], tuple_from, tuple_to, num_pieces)
+            elapsed += time.perf_counter() - start
+        return elapsed
+    return sum(len(moves) for moves in games) / best_time(run, repeat), 'moves/sec', 'higher'
+
+
+def bench_win_check(game, repeat):
+    """win_check calls per second on the given game. Each run is short, so best of many runs is kept."""
+    def run():
+        for index in range(20000):
+            game.win_check('PlayerA')
+    return 20000 / best_time(run, repeat * 20), 'calls/sec', 'higher'
+
+
+def bench_memory(repeat):
+    """Bytes allocated per new game"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [FocusGame(*PLAYERS) for index in range(1000)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del games
+    return used / 1000, 'bytes/game', 'lower'
+
+
+SCENARIOS = (
+    ('move_piece', bench_move_piece),
+    ('validate_move_invalid', bench_invalid_moves),
+    ('try_move_invalid', bench_try_move_invalid),
+    ('move_piece_mixed', lambda repeat: bench_mixed(repeat, False)),
+    ('try_move_mixed', lambda repeat: bench_mixed(repeat, True)),
+    ('reserved_move_overflow', bench_reserved_overflow),
+    ('random_games', bench_random_games),
+    ('move_piece_cross', lambda repeat: bench_variant_moves(repeat, 'cross')),
+    ('move_piece_square10', lambda repeat: bench_variant_moves(repeat, 'square10')),
+    ('win_check_crowded', lambda repeat: bench_win_check(FocusGame(*PLAYERS), repeat)),
+    ('win_check_sparse', lambda repeat: bench_win_check(position([1 | 8] + [0] * 34 + [1]), repeat)),
+    ('memory_per_game', bench_memory),
+)
+
+
+def run_all(repeat=5, names=None):
+    """
+    Function run_all, runs the scenarios
+    :param repeat: Timed runs per scenario, the best one is kept
+    :param names: Scenario names to run, defaults to all of them
+    :return: Results dictionary, ready to dump as JSON
+    """
+    results = {'python': platform.python_version(), 'machine': platform.machine(), 'scenarios': {}}
+    for name, function in SCENARIOS:
+        if names is None or name in names:
+            value, unit, better = function(repeat)
+            results['scenarios'][name] = {'value': round(value, 1), 'unit': unit, 'better': better}
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Function compare, checks results against a baseline
+    :param threshold: Largest allowed slowdown as a fraction, e.g. 0.1 for 10%
+    :return: List of (name, baseline value, value, change, regressed) for every scenario in both. change is the
+             fraction the scenario got better (positive) or worse (negative).
+    """
+    rows = []
+    for name, result in results['scenarios'].items():
+        if name not in baseline['scenarios']:
+            continue
+        old = baseline['scenarios'][name]['value']
+        change = (result['value'] - old) / old
+        if result['better'] == 'lower':
+            change = -change
+        rows.append((name, old, result['value'], change, change < -threshold))
+    return rows
+
+
+def parse_args(argv=None):
+    """Returns the parsed command line arguments"""
+    parser = argparse.ArgumentParser(description='Benchmark the FocusGame engine.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to the baseline file')
+    parser.add_argument('--output', default=None, help='also write the results to this JSON file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='allowed slowdown, 0.1 = 10%%')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per scenario')
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run (default: all)')
+    return parser.parse_args(argv)
+
+
+def report(results, baseline_path, threshold):
+    """
+    Function report, prints the results against the baseline, or just the results if there is no baseline yet or
+    it was measured with another Python version or on another machine, whose timings don't compare
+    :return: Exit status, 1 if any scenario regressed
+    """
+    try:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print(json.dumps(results, indent=2))
+        return 0
+    setups = [(key, baseline.get(key), results[key]) for key in ('python', 'machine')
+              if baseline.get(key) != results[key]]
+    if setups:
+        print('warning: not compared with %s, it was measured with %s' % (baseline_path, ', '.join(
+            '%s %s (now %s)' % (key, old, new) for key, old, new in setups)), file=sys.stderr)
+        print(json.dumps(results, indent=2))
+        return 0
+    rows = compare(results, baseline, threshold)
+    for name, old, new, change, regressed in rows:
+        print('%-24s %14.1f %14.1f %+7.1f%%%s' % (name, old, new, change * 100, '  REGRESSION' if regressed else ''))
+    return 1 if any(row[4] for row in rows) else 0
+
+
+def main(argv=None):
+    """Command line entry point, the exit status is 1 if any scenario regressed"""
+    args = parse_args(argv)
+    results = run_all(args.repeat, args.scenarios or None)
+    for path in (args.output, args.baseline if args.save_baseline else None):
+        if path is not None:
+            with open(path, 'w') as file:
+                json.dump(results, file, indent=2)
+                file.write('\n')
+    if args.save_baseline:
+        print(json.dumps(results, indent=2))
+        return 0
+    return report(results, args.baseline, args.threshold)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
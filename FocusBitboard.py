@@ -0,0 +1,259 @@
+# Description: Compact board engine for FocusGame. Each stack is packed into a single byte,
+#              which keeps the per-game footprint small when many games are held in memory at once.
+
+import tracemalloc
+
+from FocusGame import FocusGame, is_coords
+
+HEIGHT_MASK = 0b111   # Low 3 bits of a cell hold the stack height (0 through 5)
+PIECE_SHIFT = 3       # Remaining 5 bits hold one bit per piece, bottom piece first: 0 = player 1, 1 = player 2
+MAX_STACK = 5         # Stacks taller than this are trimmed from the bottom by check_stack
+BOARD_SIZE = 6
+
+
+def pack_stack(owners):
+    """
+    Function pack_stack, packs a list of piece owners (0 or 1, bottom piece first) into a single cell value
+    :param owners: List of player indexes, bottom-most piece at the 0th index
+    :return: Packed integer: height in the low bits, one bit per piece above that
+    """
+    bits = 0
+    for index, owner in enumerate(owners):
+        bits |= owner << index
+    return len(owners) | (bits << PIECE_SHIFT)
+
+
+def unpack_stack(cell):
+    """
+    Function unpack_stack, the reverse of pack_stack
+    :param cell: Packed cell value
+    :return: List of piece owners (0 or 1), bottom-most piece at the 0th index
+    """
+    bits = cell >> PIECE_SHIFT
+    return [(bits >> index) & 1 for index in range(cell & HEIGHT_MASK)]
+
+
+class CompactFocusGame:
+    """
+    Class definition for a FocusGame that stores the board as 36 packed bytes instead of a list of lists of
+    color strings. Pieces are tracked by player index (0 = first player, 1 = second player) and reserve/captured
+    pieces are plain counts. The public API (move_piece, reserved_move, show_pieces, show_reserve, show_captured)
+    returns the same results as FocusGame.
+    """
+    __slots__ = ('_players', '_board', '_reserve', '_captured', '_turn', '_current_state')
+
+    def __init__(self, tuple_1, tuple_2):
+        """
+        Special method __init__ to initialize private data members
+        _players: Tuple of both player tuples, indexed by player number 0/1
+        _board: bytearray of 36 packed cells, row-major (index = row * 6 + column)
+        _reserve: List of reserve piece counts, indexed by player number
+        _captured: List of captured piece counts, indexed by player number
+        _turn: Index of the player whose turn it is
+        _current_state: Game state
+        """
+        self._players = (tuple_1, tuple_2)
+        self._board = bytearray(BOARD_SIZE * BOARD_SIZE)
+        for row in range(BOARD_SIZE):  # Same starting layout as FocusGame: pairs of pieces, alternating per row
+            for column in range(BOARD_SIZE):
+                owner = ((column // 2) % 2) ^ (row % 2)
+                self._board[row * BOARD_SIZE + column] = pack_stack([owner])
+        self._reserve = [0, 0]
+        self._captured = [0, 0]
+        self._turn = 0
+        self._current_state = "UNFINISHED"
+
+    def player_index(self, player):
+        """Returns 0 or 1 for the given player name, None if the name doesn't belong to this game"""
+        if player == self._players[0][0]:
+            return 0
+        if player == self._players[1][0]:
+            return 1
+        return None
+
+    def top_color(self, cell):
+        """Returns the color string of the top piece of a packed, non-empty cell"""
+        height = cell & HEIGHT_MASK
+        return self._players[(cell >> (PIECE_SHIFT + height - 1)) & 1][1]
+
+    def win_check(self, player):
+        """
+        Method to check for the same two win conditions as FocusGame.win_check:
+            1) The current player has 6 or more captured pieces
+            2) The other player has no piece on top of any occupied space and no pieces in reserve
+        :param player: Current player who made a move
+        :return: True if win condition met
+        """
+        index = self.player_index(player)
+        if index is None:
+            return None
+        if self._captured[index] > 5:
+            return True
+        tops = {self.top_color(cell) for cell in self._board if cell}
+        if self._reserve[1 - index] == 0 and self._players[1 - index][1] not in tops:
+            return True
+
+    def move_piece(self, player=None, tuple_from=None, tuple_to=None, num_pieces=None):
+        """
+        Method move_piece, validates the move, makes it if valid and checks for a win condition.
+        :return: 'successfully moved', '<player> Wins', or the same error value FocusGame would return
+        """
+        is_valid_move = self.validate_move(player, tuple_from, tuple_to, num_pieces, True)
+        if is_valid_move is not True:
+            return is_valid_move
+        self.make_move(tuple_from, tuple_to, num_pieces, player)
+        return self.finish_move(player)
+
+    def reserved_move(self, player, tuple_to):
+        """
+        Method reserved_move, validates then places one reserve piece of the player at tuple_to.
+        :return: 'successfully moved', '<player> Wins', or the same error value FocusGame would return
+        """
+        is_valid_move = self.validate_move(player, tuple_to)
+        if is_valid_move is not True:
+            return is_valid_move
+        self.make_reserved_move(player, tuple_to)
+        return self.finish_move(player)
+
+    def finish_move(self, player):
+        """Runs the win check after a move was made, returns the status message for the move"""
+        if self.win_check(player) is True:
+            self._current_state = player + ' Won'
+            return player + ' Wins'
+        return 'successfully moved'
+
+    def validate_move(self, player, tuple_from, tuple_to=None, num_pieces=None, need_destination=False):
+        """
+        Method validate_move, runs the same checks in the same order as FocusGame.move_piece / reserved_move
+        :param need_destination: True when move_piece() is making the call, so tuple_to can't be left out
+        :return: True if valid move, the game state string if the game is over, otherwise False
+        """
+        if FocusGame.validate_args(self, player, tuple_from, tuple_to, num_pieces, need_destination) is False:
+            return False
+        if self._current_state != "UNFINISHED":
+            return self._current_state
+        if self._players[self._turn][0] != player:
+            return False
+        if not is_coords(tuple_from) or tuple_to is not None and (not is_coords(tuple_to) or
+                                                                  num_pieces.__class__ is not int):
+            return False  # The same checks as FocusGame.check_move, anything else can't index the board
+        if tuple_to is None:  # reserved_move() is making the call
+            if not self.on_board(tuple_from):
+                return False
+            index = self.player_index(player)
+            return index is not None and self._reserve[index] > 0
+        if tuple_from == tuple_to or not self.on_board(tuple_from) or not self.on_board(tuple_to):
+            return False
+        cell = self._board[tuple_from[0] * BOARD_SIZE + tuple_from[1]]
+        if cell == 0 or self.top_color(cell) not in self._players[self._turn]:
+            return False
+        if tuple_from[0] != tuple_to[0] and tuple_from[1] != tuple_to[1]:
+            return False  # Not directly up, down, left or right
+        distance = abs(tuple_from[0] - tuple_to[0]) + abs(tuple_from[1] - tuple_to[1])
+        return distance == num_pieces and 1 <= num_pieces <= cell & HEIGHT_MASK
+
+    def on_board(self, coords):
+        """Returns True if the (row, column) coordinates are within the game board"""
+        return 0 <= coords[0] < BOARD_SIZE and 0 <= coords[1] < BOARD_SIZE
+
+    def make_move(self, tuple_from, tuple_to, num_pieces, player):
+        """
+        Method to make_move after conditionals cleared, moves the top num_pieces of the FROM stack onto the TO
+        stack with shift/mask operations and switches turns.
+        """
+        index_from = tuple_from[0] * BOARD_SIZE + tuple_from[1]
+        index_to = tuple_to[0] * BOARD_SIZE + tuple_to[1]
+        cell = self._board[index_from]
+        remaining = (cell & HEIGHT_MASK) - num_pieces
+        bits = cell >> PIECE_SHIFT
+        moved = bits >> remaining  # Top num_pieces pieces of the FROM stack
+        self._board[index_from] = remaining | ((bits & ((1 << remaining) - 1)) << PIECE_SHIFT)
+
+        dest = self._board[index_to]
+        height = dest & HEIGHT_MASK
+        self.check_stack(index_to, height + num_pieces, (dest >> PIECE_SHIFT) | (moved << height), player)
+        self.switch_turns()
+
+    def make_reserved_move(self, player, tuple_to):
+        """
+        Method to make_reserved_move after conditionals cleared, places one of the player's reserve pieces on
+        top of the stack at tuple_to and switches turns.
+        """
+        index = self.player_index(player)
+        self._reserve[index] -= 1
+        index_to = tuple_to[0] * BOARD_SIZE + tuple_to[1]
+        dest = self._board[index_to]
+        height = dest & HEIGHT_MASK
+        self.check_stack(index_to, height + 1, (dest >> PIECE_SHIFT) | (index << height), player)
+        self.switch_turns()
+
+    def check_stack(self, index_to, height, bits, player):
+        """
+        Method check_stack, trims a stack taller than 5 from the bottom, sending the player's own pieces to
+        their reserve and the opponent's pieces to their captured count. Stores the packed result on the board.
+        :param index_to: Board index of the destination cell
+        :param height: Height of the destination stack, may be more than 5
+        :param bits: Piece bits of the destination stack, bottom piece first
+        :param player: The current player who made the move
+        """
+        if height > MAX_STACK:
+            mover = self.player_index(player)
+            color = self._players[mover][1]
+            for item in range(height - MAX_STACK):
+                if self._players[(bits >> item) & 1][1] == color:
+                    self._reserve[mover] += 1
+                else:
+                    self._captured[mover] += 1
+            bits >>= height - MAX_STACK
+            height = MAX_STACK
+        self._board[index_to] = height | (bits << PIECE_SHIFT)
+
+    def switch_turns(self):
+        """Method to change turns after a successful player move"""
+        self._turn ^= 1
+
+    def show_pieces(self, coords):
+        """
+        Returns a list showing the color of the pieces at the given location, bottom-most piece at the 0th index
+        """
+        if not self.on_board(coords):
+            return "Invalid index"
+        cell = self._board[coords[0] * BOARD_SIZE + coords[1]]
+        return [self._players[owner][1] for owner in unpack_stack(cell)]
+
+    def show_reserve(self, player_name):
+        """Returns the count of pieces in reserve for the player"""
+        index = self.player_index(player_name)
+        if index is not None:
+            return self._reserve[index]
+
+    def show_captured(self, player_name):
+        """Returns the number of pieces captured by the player"""
+        index = self.player_index(player_name)
+        if index is not None:
+            return self._captured[index]
+
+
+def measure_memory(game_class, num_games=10000):
+    """
+    Function measure_memory, allocates num_games new games of game_class and measures the memory they hold.
+    :param game_class: FocusGame or CompactFocusGame
+    :param num_games: Number of live games to allocate
+    :return: Average number of bytes per game
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    games = [game_class(('PlayerA', 'R'), ('PlayerB', 'G')) for index in range(num_games)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del games
+    return total / num_games
+
+
+if __name__ == '__main__':
+    list_bytes = measure_memory(FocusGame)
+    compact_bytes = measure_memory(CompactFocusGame)
+    print('FocusGame (list of lists): %8.0f bytes per game' % list_bytes)
+    print('CompactFocusGame (packed): %8.0f bytes per game' % compact_bytes)
+    print('Reduction: %.1fx' % (list_bytes / compact_bytes))
@@ -0,0 +1,37 @@
+# Description: Benchmark of copying a FocusGame: copy.deepcopy against clone(), snapshot()/restore() and the
+#              to_bytes()/from_bytes() round trip, on a position partway through a random game.
+
+import copy
+import time
+
+from FocusGame import FocusGame
+from FocusPositions import midgame_position
+
+
+def time_per_call(function, repeat):
+    """Returns the average time of function() in microseconds"""
+    start = time.perf_counter()
+    for index in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def benchmark(repeat=2000):
+    """Prints the cost of each way of copying the game, in microseconds"""
+    game = midgame_position()
+    snapshot = game.snapshot()
+    data = game.to_bytes()
+    results = (('copy.deepcopy', time_per_call(lambda: copy.deepcopy(game), repeat // 10)),
+               ('clone', time_per_call(game.clone, repeat)),
+               ('snapshot', time_per_call(game.snapshot, repeat)),
+               ('restore', time_per_call(lambda: game.restore(snapshot), repeat)),
+               ('to_bytes', time_per_call(game.to_bytes, repeat)),
+               ('from_bytes', time_per_call(lambda: FocusGame.from_bytes(data), repeat)))
+    deepcopy_time = results[0][1]
+    for name, microseconds in results:
+        print('%-14s %8.1f us  (%5.1fx faster than deepcopy)' % (name, microseconds, deepcopy_time / microseconds))
+    print('to_bytes size: %d bytes' % len(data))
+
+
+if __name__ == '__main__':
+    benchmark()
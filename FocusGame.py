@@ -2,6 +2,242 @@
 # Date: November 16th, 2020
 # Description: CS162: Portfolio Project: FocusGame
 
+import random
+import struct
+
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))  # Up, down, left, right, in the order moves are listed
+
+
+def zobrist_tables(cells, levels, counts):
+    """
+    Function zobrist_tables, draws the Zobrist hashing keys for a board. A fixed seed keeps position hashes the same
+    across runs and processes, and the standard board gets the same keys whichever variants exist.
+    :param cells: Number of cells, including cells cut off the board
+    :param levels: Tallest a stack can get before check_stack trims it (twice the stack limit)
+    :param counts: Number of reserve / captured counts, 0 through every piece on the board
+    :return: (stack keys [cell][level][owner], reserve keys [player][count], captured keys [player][count], turn key)
+    """
+    rng = random.Random(162)
+    stack = [[[rng.getrandbits(64) for owner in range(2)] for level in range(levels)] for cell in range(cells)]
+    reserve = [[rng.getrandbits(64) for count in range(counts)] for player in range(2)]
+    captured = [[rng.getrandbits(64) for count in range(counts)] for player in range(2)]
+    return stack, reserve, captured, rng.getrandbits(64)  # The turn key is included while it is player 2's turn
+
+
+def corner_cells(size, depth):
+    """
+    Function corner_cells, returns the cells cut off the corners of a size x size board: the cells fewer than depth
+    steps from a corner. corner_cells(8, 2) removes 3 cells per corner, the shape of the original Focus board.
+    """
+    return [(row, column) for row in range(size) for column in range(size)
+            if min(row, size - 1 - row) + min(column, size - 1 - column) < depth]
+
+
+class BoardVariant:
+    """
+    Class definition for a board variant: the shape of the board, its rules, and per-cell tables worked out once
+    from them. Get variants from board_variant(), which builds each one once and shares it between every game.
+    Games only read the tables, so they are public data members.
+    """
+    def __init__(self, size, removed, stack_limit, capture_win, margin):
+        """
+        Special method __init__ to build the tables, see board_variant() for the parameters
+        cells: Dictionary of (row, column): cell number (row * size + column), for cells on the board only
+        coords: List of cell number: (row, column), None for cells cut off the board, padded to 64 for move words
+        start: List of ((row, column), owner) starting pieces, owner 0 for the first player's piece
+        reach: Dictionary of (row, column): {(row, column): distance} for each cell straight up, down, left or right
+        moves: Nested list [row][column][stack height] of the (tuple_from, tuple_to, num_pieces) moves from a stack
+        reserve_moves: Tuple of every reserve move, ((row, column),)
+        words: Dictionary of move word: move, empty if the board is bigger than move words can encode (8x8)
+        """
+        if stack_limit > 7:
+            raise ValueError('stack_limit can be at most 7, stack heights are stored in 3 bits')
+        if size > 15:
+            raise ValueError('size can be at most 15, to_bytes() stores piece counts in a byte')
+        self.size, self.stack_limit, self.capture_win = size, stack_limit, capture_win
+        self.removed, self.margin = frozenset(removed), margin
+        self.cells = {(row, column): row * size + column for row in range(size) for column in range(size)
+                      if (row, column) not in self.removed}
+        self.coords = [None] * max(64, size * size)
+        for coords, cell in self.cells.items():
+            self.coords[cell] = coords
+        inner = range(margin, size - margin)
+        # Pairs of pieces alternate along each row, with the first player's pair first on the first row
+        self.start = [(coords, ((coords[1] - margin) // 2 + coords[0] - margin) % 2) for coords in self.cells
+                      if coords[0] in inner and coords[1] in inner]
+        self.reach = {coords: self.line_distances(coords) for coords in self.cells}
+        self.moves = self.build_moves()
+        self.reserve_moves = tuple((coords,) for coords in self.cells)
+        self.words = self.build_words() if size <= 8 else {}
+        self.zobrist_stack, self.zobrist_reserve, self.zobrist_captured, self.zobrist_turn = \
+            zobrist_tables(size * size, 2 * stack_limit, len(self.start) + 1)
+
+    def __deepcopy__(self, memo):
+        """Special method __deepcopy__, a deep copy of a game shares its variant instead of copying the tables"""
+        return self
+
+    def __reduce__(self):
+        """Special method __reduce__, pickles the variant as its parameters, unpickling looks it up again"""
+        return board_variant, (self.size, tuple(sorted(self.removed)), self.stack_limit, self.capture_win, self.margin)
+
+    def line_distances(self, coords):
+        """
+        Method line_distances, finds the cells a stack at coords can move to, in a straight line and on the board
+        :return: Dictionary of (row, column): distance from coords
+        """
+        distances = {}
+        for row_step, column_step in DIRECTIONS:
+            for distance in range(1, self.size):
+                target = (coords[0] + row_step * distance, coords[1] + column_step * distance)
+                if target in self.cells:
+                    distances[self.coords[self.cells[target]]] = distance
+        return distances
+
+    def build_moves(self):
+        """
+        Method build_moves, lists the moves from every cell for every stack height, so each game's move cache
+        only holds references to these tuples
+        :return: Nested list [row][column][stack height] of tuples of (tuple_from, tuple_to, num_pieces)
+        """
+        table = [[[()] * (self.stack_limit + 1) for column in range(self.size)] for row in range(self.size)]
+        for coords in self.cells:
+            moves = []
+            for num_pieces in range(1, self.stack_limit + 1):
+                for tuple_to, distance in self.reach[coords].items():
+                    if distance == num_pieces:
+                        moves.append((coords, tuple_to, num_pieces))
+                table[coords[0]][coords[1]][num_pieces] = tuple(moves)
+        return table
+
+    def build_words(self):
+        """Method build_words, returns a dictionary of move word: move for every move in the moves table"""
+        words = {}
+        for coords in self.cells:
+            for move in self.moves[coords[0]][coords[1]][self.stack_limit]:
+                words[encode_move(move, self.size)] = move
+            words[encode_move((coords,), self.size)] = (coords,)
+        return words
+
+
+_variants = {}  # Variant parameters: BoardVariant, built by board_variant()
+
+
+def board_variant(size=6, removed=(), stack_limit=5, capture_win=6, margin=0):
+    """
+    Function board_variant, returns the variant with the given rules, building its tables the first time
+    :param size: Number of rows (and columns) of the board
+    :param removed: (row, column) cells cut off the board, e.g. corner_cells(8, 2)
+    :param stack_limit: Tallest a stack can be, pieces below it go to reserve or are captured (at most 7)
+    :param capture_win: Number of captured pieces that wins the game
+    :param margin: Rows and columns around the edge that start empty
+    :return: BoardVariant
+    """
+    key = (size, frozenset(removed), stack_limit, capture_win, margin)
+    if key not in _variants:
+        _variants[key] = BoardVariant(size, removed, stack_limit, capture_win, margin)
+    return _variants[key]
+
+
+def move_table(size):
+    """
+    Function move_table, returns the (tuple_from, tuple_to, num_pieces) moves that stay on a size x size board
+    with the standard rules, indexed [row][column][stack height]
+    :param size: Number of rows (and columns) of the board
+    """
+    return board_variant(size).moves
+
+
+# Move words: a move packed into 16 bits, used by try_move() and by game records (FocusRecord.py).
+# Bit 15 reserve flag, bits 9-14 FROM cell, bits 3-8 TO cell, bits 0-2 number of pieces, where cells are numbered
+# row * board size + column. A reserve move has FROM cell 0 and 1 piece.
+RESERVE_FLAG = 1 << 15
+
+# Set in the game state byte of to_bytes() data, and in the board size byte of a game record header, when the
+# variant's rules (encode_variant()) follow
+VARIANT_FLAG = 0x80
+
+# Status codes returned by FocusGame.try_move()
+MOVED = 0           # The move was made
+WON = 1             # The move was made and the player who made it won
+NOT_YOUR_TURN = 2
+GAME_OVER = 3
+OFF_BOARD = 4       # A location is off the board, or the move is from and to the same location
+NO_RESERVE = 5
+EMPTY_STACK = 6
+NOT_YOUR_PIECE = 7  # The top piece of the FROM stack belongs to the other player
+NOT_STRAIGHT = 8    # Not straight up, down, left or right
+WRONG_DISTANCE = 9  # Distance moved isn't the number of pieces, or the stack has fewer pieces
+BAD_MOVE = 10       # Not a move word or move tuple
+STATUS_NAMES = ('moved', 'won', 'not_your_turn', 'game_over', 'off_board', 'no_reserve', 'empty_stack',
+                'not_your_piece', 'not_straight', 'wrong_distance', 'bad_move')
+
+
+def encode_move(move, size=6):
+    """
+    Function encode_move, packs a move into a 16 bit word
+    :param move: (tuple_from, tuple_to, num_pieces), or (tuple_to,) for a reserve move
+    :param size: Board size (number of rows)
+    :return: int word
+    """
+    if len(move) == 1:
+        return RESERVE_FLAG | (move[0][0] * size + move[0][1]) << 3 | 1
+    tuple_from, tuple_to, num_pieces = move
+    return (tuple_from[0] * size + tuple_from[1]) << 9 | (tuple_to[0] * size + tuple_to[1]) << 3 | num_pieces
+
+
+def decode_move(word, size=6):
+    """
+    Function decode_move, the reverse of encode_move
+    :return: (tuple_from, tuple_to, num_pieces), or (tuple_to,) for a reserve move
+    """
+    tuple_to = divmod((word >> 3) & 0x3F, size)
+    if word & RESERVE_FLAG:
+        return (tuple_to,)
+    return divmod((word >> 9) & 0x3F, size), tuple_to, word & 0x7
+
+
+def encode_variant(variant):
+    """
+    Function encode_variant, the variant's rules as FocusGame.to_bytes() and game records store them for
+    non-default variants: stack limit, captures to win, margin, number of removed cells, then the removed cells
+    :return: bytes
+    """
+    removed = sorted(row * variant.size + column for row, column in variant.removed)
+    return struct.pack('4B', variant.stack_limit, variant.capture_win, variant.margin, len(removed)) + bytes(removed)
+
+
+def read_variant(data, position, size):
+    """
+    Function read_variant, reads the variant rules encode_variant() writes
+    :param position: Offset of the rules in data
+    :return: (BoardVariant, offset of the first byte after the rules)
+    """
+    stack_limit, capture_win, margin, count = struct.unpack_from('4B', data, position)
+    removed = [divmod(cell, size) for cell in data[position + 4:position + 4 + count]]
+    return board_variant(size, removed, stack_limit, capture_win, margin), position + 4 + count
+
+
+def is_coords(value):
+    """Function is_coords, returns True if value is a (row, column) tuple of two ints"""
+    return value.__class__ is tuple and len(value) == 2 and value[0].__class__ is int and value[1].__class__ is int
+
+
+def move_words(size):
+    """
+    Function move_words, returns a dictionary of move word: move for every move that stays on a size x size
+    board with the standard rules, with the same move tuples as move_table()
+    """
+    return board_variant(size).words
+
+
+STANDARD = board_variant()  # 6x6 board, stacks of up to 5, 6 captured pieces win
+CROSS = board_variant(8, corner_cells(8, 2), margin=1)  # Original Focus board: 8x8 without 3 cells per corner
+VARIANTS = {'standard': STANDARD, 'cross': CROSS, 'square8': board_variant(8), 'square10': board_variant(10)}
+# Zobrist hashing keys of the standard board
+ZOBRIST_STACK, ZOBRIST_RESERVE = STANDARD.zobrist_stack, STANDARD.zobrist_reserve
+ZOBRIST_CAPTURED, ZOBRIST_TURN = STANDARD.zobrist_captured, STANDARD.zobrist_turn
+
+
 class Player:
     """
     Class definition for a Player object for FocusGame
@@ -60,18 +296,32 @@ class Player:
         """
         return len(self._reserve)
 
+    def clone(self):
+        """Method clone returns a copy of this player with its own captured and reserve lists
+        """
+        player = Player(self._player)
+        player._captured = list(self._captured)
+        player._reserve = list(self._reserve)
+        return player
+
+    def subtract_captured(self):
+        """Method subtract_captured removes and returns the most recently captured piece (used to undo a move)
+        """
+        return self._captured.pop()
+
 
 class FocusGame:
     """
     Class definition to create an instance of a FocusGame, an abstract board game.
-    The game is played by two players an 6x6 board.
+    The game is played by two players on a 6x6 board, or on another BoardVariant.
     Each player makes one move per turn: Single move, multiple move, or reserved move.
     """
-    def __init__(self, tuple_1, tuple_2):
+    def __init__(self, tuple_1, tuple_2, variant=None):
         """
         Special method __init__ to initialize private data members
         tuple_1 contains two values ('player', 'color'), as it was first passed. This will be the first player.
         tuple_2 contains two values ('player', 'color'), initialized to second player.
+        variant: BoardVariant from board_variant() or VARIANTS, defaults to the standard 6x6 board
         _turn: Private data member to keep track of who's turn it is, initialized to first tuple passed as arg
         _board: Private data member representation of game board and pieces
         _current_state: Game state
@@ -79,46 +329,50 @@ class FocusGame:
         self._player_1 = Player(tuple_1)
         self._player_2 = Player(tuple_2)
         self._turn = self._player_1.get_player()  # Set _turn to first tuple argument passed.
+        self._variant = variant if variant is not None else STANDARD  # Board shape, rules and per-cell tables
+        size = self._variant.size
 
         # Initialize game board below, a list of lists to represent rows, columns. Game pieces are also a list.
-        self._board = [[] for index in range(6)]
-        for i in range(6):  # Initialize game board, first player's (tuple_1) pieces are placed first at 0,0
-            if i % 2 == 0:
-                self._board[i] = [
-                    [tuple_1[1]], [tuple_1[1]], [tuple_2[1]], [tuple_2[1]], [tuple_1[1]], [tuple_1[1]]
-                ]
-            else:
-                self._board[i] = [
-                    [tuple_2[1]], [tuple_2[1]], [tuple_1[1]], [tuple_1[1]], [tuple_2[1]], [tuple_2[1]]
-                ]
+        # First player's (tuple_1) pieces are placed first, at 0,0 on the standard board
+        self._board = [[[] for column in range(size)] for row in range(size)]
+        colors = (tuple_1[1], tuple_2[1])
+        for coords, owner in self._variant.start:
+            self._board[coords[0]][coords[1]] = [colors[owner]]
 
         self._current_state = "UNFINISHED"  # Set game to UNFINISHED
+        # Undo stack, one (tuple_from, tuple_to, num_pieces, removed_pieces, turn, state, hash, previous entry) entry
+        # per move made, None when empty. Entries are never changed, so clones share the stack instead of copying it.
+        self._history = None
+        self._recorder = None  # Optional GameRecordWriter (FocusRecord.py) that logs every successful move
+        self._stats = None  # Optional GameStats (FocusStats.py) the hot paths are timed into, see set_stats()
 
+        # Number of cells topped by each player's piece (index 0 = first player), kept up to date by make_move /
+        # make_reserved_move so win_check doesn't have to scan the board. The 64-bit Zobrist hash of the position
+        # is updated as moves are made too. rebuild_caches() sets both.
+        # Per-cell cache of (tuple_from, tuple_to, num_pieces) moves, refreshed only for cells a move touches
+        self._move_cache = [[()] * size for row in range(size)]
+        self.rebuild_caches()
 
     def win_check(self, player):
         """
         Method to check for two win conditions:
-            1) The current player has 6 or more captured pieces
-            2) The game board only has one type of "piece" on the top of all occupied spaces.
-               As the current player made a move before win_check was called, this "piece" must belong to them.
-               Thus, they dominate the game board, and the other player cannot make a move.
+            1) The current player has captured the variant's capture_win pieces (6 on the standard board)
+            2) The other player cannot make a move: no occupied space has their piece on top,
+               and they have no pieces in reserve.
+        Both checks use counts kept up to date as moves are made, so the board is not scanned.
         :param player: Current player who made a  move
         :return: True if win condition met
         """
         if player == self._player_1.get_player_name():
-            if self._player_1.show_captured() > 5:
-                return True  # Win condition met
+            mover, opponent, opponent_index = self._player_1, self._player_2, 1
         elif player == self._player_2.get_player_name():
-            if self._player_2.show_captured() > 5:
-                return True  # Win condition met
-
-        temp = set()  # Create a blank set to hold values of top-most pieces (no duplicate values this way)
-        for list in self._board:         # Iterate through game board's rows
-            for item in list:            # Iterate through game board's columns
-                if item != []:           # Only consider spots that aren't empty
-                    temp.add(item[-1])   # Add the last (top) game piece to the set
-        if len(temp) == 1:  # Only one 'color' was found on the topmost piece of every space of game board
-            return True      # Win condition met
+            mover, opponent, opponent_index = self._player_2, self._player_1, 0
+        else:
+            return None
+        if mover.show_captured() >= self._variant.capture_win:
+            return True  # Win condition met
+        if self._controlled[opponent_index] == 0 and opponent.show_reserve() == 0:
+            return True  # Win condition met, the other player has no legal move
 
     def move_piece(self, player=None, tuple_from=None, tuple_to=None, num_pieces=None):
         """
@@ -130,19 +384,160 @@ class FocusGame:
         :param num_pieces: Number of pieces player is requesting to move from the "tuple_from" location
         :return: 'successfully moved', or error message if invalid move
         """
-        # Call to validate the proposed move
-        is_valid_move = self.validate_move(player, tuple_from, tuple_to, num_pieces)
+        if self.validate_args(player, tuple_from, tuple_to, num_pieces, True) is False:
+            return False  # insufficient number of, or wrong type of args passed
+        return self.move_message(player, self.try_move((tuple_from, tuple_to, num_pieces), player))
 
-        if is_valid_move is True:  # Move validated
-            self.make_move(tuple_from, tuple_to, num_pieces, player)  # Method call to move the piece
-            if self.win_check(player) is True:  # A win condition was met
-                string = player + ' Wins'
-                self._current_state = player + ' Won'
-                return string
-            else:
-                return 'successfully moved'
-        else:  # Return error message if not a valid move
-            return is_valid_move
+    def move_message(self, player, status):
+        """
+        Method move_message, turns a try_move() status code into the message move_piece() / reserved_move() return
+        :return: 'successfully moved', '<player> Wins', the game state if the game is over, otherwise False
+        """
+        if status == MOVED:
+            return 'successfully moved'
+        if status == WON:
+            return player + ' Wins'
+        if status == GAME_OVER:
+            return self._current_state
+        return False
+
+    def try_move(self, move, player=None):
+        """
+        Method try_move, fast path for bots and replays: validates a move in one pass and makes it if it is legal.
+        No strings or tuples are built unless the move is made.
+        :param move: Move word from encode_move(), or a move in the form legal_moves() yields
+        :param player: Name of the player making the move, defaults to the player whose turn it is
+        :return: Status code: MOVED or WON if the move was made, otherwise why it was rejected (see STATUS_NAMES)
+        """
+        if move.__class__ is not int:
+            status = self.check_move(move, player)
+        elif self._current_state != "UNFINISHED":
+            return GAME_OVER
+        elif player is not None and player != self._turn[0]:
+            return NOT_YOUR_TURN
+        else:  # Every word in the variant's words stays on the board and moves straight, only the stack is left
+            word, move = move, self._variant.words.get(move)
+            if move is None:
+                return self.word_status(word)
+            status = self.reserve_status(move[0]) if len(move) == 1 else self.stack_status(move[0], move[2])
+        if status != MOVED:
+            return status
+        return self.make_checked_move(move)
+
+    def make_checked_move(self, move):
+        """
+        Method make_checked_move, makes a move try_move() has validated for the player whose turn it is
+        :param move: Move in the form legal_moves() yields
+        :return: WON if the player won with it, otherwise MOVED
+        """
+        player = self._turn[0]
+        if len(move) == 1:
+            self.make_reserved_move(player, move[0])
+        else:
+            self.make_move(move[0], move[1], move[2], player)
+        if self._recorder is not None:
+            self._recorder.write_move(move)
+        if self.win_check(player) is True:  # A win condition was met
+            self._current_state = player + ' Won'
+            if self._recorder is not None:
+                self._recorder.end_game()
+            return WON
+        return MOVED
+
+    def check_move(self, move, player=None):
+        """
+        Method check_move, every check validate_move() makes, in one pass and without building strings
+        :param move: Move word from encode_move(), or a move in the form legal_moves() yields
+        :param player: Name of the player making the move, defaults to the player whose turn it is
+        :return: MOVED if the move is legal, otherwise the status code of the check it fails
+        """
+        if self._current_state != "UNFINISHED":
+            return GAME_OVER
+        if player is not None and player != self._turn[0]:
+            return NOT_YOUR_TURN
+        if move.__class__ is int:
+            if move not in self._variant.words:
+                return self.word_status(move)
+            move = self._variant.words[move]
+        elif move.__class__ is not tuple or len(move) not in (1, 3):
+            return BAD_MOVE
+        elif not is_coords(move[0]) or len(move) == 3 and (not is_coords(move[1]) or move[2].__class__ is not int):
+            return BAD_MOVE  # Anything else would only fail in make_move, after the game has started to change
+        if len(move) == 1:
+            return self.reserve_status(move[0])
+        return self.stack_move_status(move[0], move[1], move[2])
+
+    def word_status(self, word):
+        """
+        Method word_status, finds why a move word isn't one of the moves that stay on the board
+        :return: Status code of the check the word fails
+        """
+        if word < 0 or word > 0xFFFF or self._variant.words == {}:
+            return BAD_MOVE  # Not a 16 bit word, or the board is too big for move words
+        tuple_to = self._variant.coords[(word >> 3) & 0x3F]
+        if word & RESERVE_FLAG:  # Only a destination off the board, or bits encode_move() never sets
+            return OFF_BOARD if tuple_to is None else BAD_MOVE
+        return self.stack_move_status(self._variant.coords[(word >> 9) & 0x3F], tuple_to, word & 0x7)
+
+    def stack_move_status(self, tuple_from, tuple_to, num_pieces):
+        """
+        Method stack_move_status, checks a move_piece() move for the player whose turn it is
+        :param tuple_from: Coordinates to move from, None if they are not on the board
+        :param tuple_to: Coordinates to move to, None if they are not on the board
+        :return: MOVED if the move is legal, otherwise the status code of the check it fails
+        """
+        cells = self._variant.cells
+        if tuple_from not in cells or tuple_to not in cells or tuple_from == tuple_to:
+            return OFF_BOARD  # Off the board, or to and from destinations the same
+        stack = self._board[tuple_from[0]][tuple_from[1]]
+        if stack == []:
+            return EMPTY_STACK
+        if stack[-1] not in self._turn:
+            return NOT_YOUR_PIECE
+        distance = self._variant.reach[tuple_from].get(tuple_to)
+        if distance is None:
+            return NOT_STRAIGHT
+        if distance != num_pieces or num_pieces > len(stack):
+            return WRONG_DISTANCE
+        return MOVED
+
+    def stack_status(self, tuple_from, num_pieces):
+        """
+        Method stack_status, the stack_move_status() checks that depend on the FROM stack, for a move known to stay
+        on the board and move straight
+        :return: MOVED if the move is legal, otherwise the status code of the check it fails
+        """
+        stack = self._board[tuple_from[0]][tuple_from[1]]
+        if stack == []:
+            return EMPTY_STACK
+        if stack[-1] not in self._turn:
+            return NOT_YOUR_PIECE
+        if num_pieces > len(stack):
+            return WRONG_DISTANCE
+        return MOVED
+
+    def reserve_status(self, tuple_to):
+        """
+        Method reserve_status, checks a reserved_move() move for the player whose turn it is
+        :return: MOVED if the move is legal, otherwise the status code of the check it fails
+        """
+        if tuple_to not in self._variant.cells:
+            return OFF_BOARD
+        mover = self._player_1 if self._turn[0] == self._player_1.get_player_name() else self._player_2
+        if mover.show_reserve() == 0:
+            return NO_RESERVE
+        return MOVED
+
+    def play_move(self, player, move):
+        """
+        Method play_move, makes a move in the form yielded by legal_moves() through move_piece() / reserved_move()
+        :param player: Player requesting to make move
+        :param move: (tuple_from, tuple_to, num_pieces), or (tuple_to,) for a reserve move
+        :return: Same message move_piece() / reserved_move() returns
+        """
+        if len(move) == 1:
+            return self.reserved_move(player, move[0])
+        return self.move_piece(player, move[0], move[1], move[2])
 
     def validate_move(self, player, tuple_from, tuple_to=None, num_pieces=None):
         """
@@ -201,42 +596,39 @@ class FocusGame:
         From and to moves are within range : return True
         Either from or to moves are out of range : return False
         """
+        cells = self._variant.cells  # Every (row, column) on the board, whatever its shape
         if tuple_to == None:  # This if conditional triggers if reserved_move is making the function call
             reserve_destination = tuple_from  # To avoid confusion switching  "from" and "to"
             # Checking where reserve move is going TO is within the game board
-            if reserve_destination[0] < 0 or reserve_destination[0] > len(self._board) - 1:
-                return False
-            elif reserve_destination[1] < 0 or reserve_destination[1] > len(self._board) - 1:
+            if reserve_destination not in cells:
                 return False
+            return True  # Reserve destination is on the board, there is no FROM location to check
 
         if tuple_from == tuple_to:  # To and from destinations the same
             return False
-        # Check rows and columns for FROM location ( acceptable index is 0 through 5):
-        elif tuple_from[0] < 0 or tuple_from[0] > len(self._board) - 1:
-            return False  # Index range less than zero OR greater than five
-        elif tuple_from[1] < 0 or tuple_from[1] > len(self._board) - 1:
-            return False
-        # Check rows and columns for TO location ( acceptable index is 0 through 5):
-        elif tuple_to[0] < 0 or tuple_to[0] > len(self._board) - 1:
+        elif tuple_from not in cells:  # Check FROM location is on the board
             return False
-        elif tuple_to[1] < 0 or tuple_to[1] > len(self._board) - 1:
+        elif tuple_to not in cells:  # Check TO location is on the board
             return False
 
-    def validate_args(self, player, tuple_from, tuple_to, num_pieces):
+    def validate_args(self, player, tuple_from, tuple_to, num_pieces, need_destination=False):
         """
         Validate move_piece() arguments are of correct types to proceed with other checks,
         Minimum number of args needed to be passed is player and "tuple_from" if reserved_move()
         is making the call
+        :param need_destination: True when move_piece() is making the call, so tuple_to can't be left out
         :return: False if any conditionals below are not cleared
         """
         if isinstance(player, str) is False:
             return False
         if tuple_from is None:
             return False
-        if tuple_to is not None and isinstance(tuple_from, tuple) is False:
+        if isinstance(tuple_from, tuple) is False:
             return False
-        if tuple_from is not None and isinstance(tuple_to, tuple) is False:
+        if tuple_to is not None and isinstance(tuple_to, tuple) is False:
             return False
+        if tuple_to is None and (num_pieces is not None or need_destination):
+            return False  # move_piece() called without a destination
         if tuple_to is not None and num_pieces is None:
             return False
         if tuple_to is not None and isinstance(num_pieces, int) is False:
@@ -288,18 +680,13 @@ class FocusGame:
         :return: True if all conditionals passed.
                  Error type string depending on which conditional failed.
         """
-        if tuple_from[0] != tuple_to[0] and tuple_from[1] != tuple_to[1]:
+        # Distance user is requesting to move, looked up in the cells straight up, down, left or right of FROM
+        request_distance = self._variant.reach[tuple_from].get(tuple_to)
+        if request_distance is None:
             return "NOT_X_OR_Y"  # From and to: either the y axis (rows), or x axis (columns) must match
             # to maintain only moving up, down, left or right.
-
-        if tuple_from[0] == tuple_to[0]:  # rows match, check move distance for columns:
-            request_distance = abs(tuple_from[1] - tuple_to[1])  # Distance user is requesting to move
-            if request_distance != num_pieces:
-                return "TOOFAR"
-        elif tuple_from[1] == tuple_to[1]:  # columns match, check move distance for rows:
-            request_distance = abs(tuple_from[0] - tuple_to[0])  # Distance user is requesting to move
-            if request_distance != num_pieces:
-                return "TOOFAR"
+        if request_distance != num_pieces:
+            return "TOOFAR"
 
         # the length of the list (stack of pieces) that exists at the specified move from position on the board:
         move_length = len(self._board[tuple_from[0]][tuple_from[1]])  # maximum move distance is move_length
@@ -315,15 +702,27 @@ class FocusGame:
         :param tuple_from: Where the piece(s) piece will be taken from
         :param tuple_to: Where the piece(s) will be placed
         """
+        old_hash = self._hash
+        self._hash ^= self.hash_stack(tuple_from) ^ self.hash_stack(tuple_to)  # Hash out both stacks as they were
+        self.count_stack(tuple_from, -1)
+        self.count_stack(tuple_to, -1)
         slice = len(self._board[tuple_from[0]][tuple_from[1]]) - num_pieces
         temp_list = self._board[tuple_from[0]][tuple_from[1]][slice:]  # Slicing operation to obtain pieces to move
-        for item in temp_list:  # Iterate through this temp list and add them to end of the destination game piece
-            self._board[tuple_to[0]][tuple_to[1]].append(item)
-        self.check_stack(tuple_to, player)  # check destination game piece in event it is now > 5 pieces
+        # Add them to end of the destination game piece. Stacks are replaced, never changed in place, so clones
+        # of the game can share them (see clone())
+        self._board[tuple_to[0]][tuple_to[1]] = self._board[tuple_to[0]][tuple_to[1]] + temp_list
+        removed = self.check_stack(tuple_to, player)  # check destination game piece in event it is now > 5 pieces
+        self._history = (tuple_from, tuple_to, num_pieces, removed, self._turn, self._current_state, old_hash,
+                         self._history)
 
         # Removes the now duplicate piece(s) that were moved TO another stack from the FROM stack:
         slice_subtract = len(self._board[tuple_from[0]][tuple_from[1]]) - num_pieces
         self._board[tuple_from[0]][tuple_from[1]] = self._board[tuple_from[0]][tuple_from[1]][:slice_subtract]
+        self._hash ^= self.hash_stack(tuple_from) ^ self.hash_stack(tuple_to)  # Hash in both stacks as they are now
+        self.count_stack(tuple_from, 1)
+        self.count_stack(tuple_to, 1)
+        self.update_move_cache(tuple_from)
+        self.update_move_cache(tuple_to)
         self.switch_turns(player)
 
     def reserved_move(self, player, tuple_to):
@@ -335,17 +734,9 @@ class FocusGame:
         :param tuple_to: Where the reserve piece is proposed to be moved to
         :return 'successfully moved' if valid move made, otherwise returns error message of type of error encountered
         """
-        is_valid_move = self.validate_move(player, tuple_to) #  validate move before making it
-        if is_valid_move is True:
-            self.make_reserved_move(player, tuple_to)
-            if self.win_check(player) is True:
-                string = player + ' Wins'
-                self._current_state = player + ' Won'
-                return string
-            else:
-                return 'successfully moved'
-        else:  # Reserved move wasn't valid, return reason why not
-            return is_valid_move
+        if self.validate_args(player, tuple_to, None, None) is False:
+            return False
+        return self.move_message(player, self.try_move((tuple_to,), player))
 
     def make_reserved_move(self, player, tuple_to):
         """
@@ -353,27 +744,41 @@ class FocusGame:
         :param player: Current player
         :param tuple_to: Where the reserve piece will be placed
         """
-        if player == self._player_1.get_player_name():  # Subtract reserve piece from correct player's reserve list
-            item = self._player_1.subtract_reserve()
-        else:
-            item = self._player_2.subtract_reserve()
-        self._board[tuple_to[0]][tuple_to[1]].append(item)  # Append reserve piece to the location given
-        self.check_stack(tuple_to, player)  # Check this location to handle if its now >5 game pieces
+        old_hash = self._hash
+        mover = self._player_1 if player == self._player_1.get_player_name() else self._player_2
+        self._hash ^= self.hash_stack(tuple_to) ^ self.hash_counts(mover)
+        self.count_stack(tuple_to, -1)
+        item = mover.subtract_reserve()  # Subtract reserve piece from correct player's reserve list
+        self._hash ^= self.hash_counts(mover)
+        self._board[tuple_to[0]][tuple_to[1]] = self._board[tuple_to[0]][tuple_to[1]] + [item]  # Add reserve piece
+        removed = self.check_stack(tuple_to, player)  # Check this location to handle if its now >5 game pieces
+        self._hash ^= self.hash_stack(tuple_to)
+        self.count_stack(tuple_to, 1)
+        self._history = (None, tuple_to, 1, removed, self._turn, self._current_state, old_hash, self._history)
+        self.update_move_cache(tuple_to)
         self.switch_turns(player)
 
     def check_stack(self, tuple_to, player):
         """
         Method check stack, handles sending pieces to the player's captured or reserved lists.
         Updates the game board piece location to account for pieces sent to reserve or captured.
-        :param tuple_to: Check the destination game piece if > 5 pieces in length
+        :param tuple_to: Check the destination game piece if longer than the stack limit (5 on the standard board)
         :param player: The current player who made the move
+        :return: List of the pieces removed from the bottom of the stack (empty if nothing was removed)
         """
-        if len(self._board[tuple_to[0]][tuple_to[1]]) > 5:
-            num_items_to_remove = len(self._board[tuple_to[0]][tuple_to[1]]) - 5
+        limit = self._variant.stack_limit
+        if len(self._board[tuple_to[0]][tuple_to[1]]) > limit:
+            num_items_to_remove = len(self._board[tuple_to[0]][tuple_to[1]]) - limit
+            mover = self._player_1 if player == self._player_1.get_player_name() else self._player_2
+            self._hash ^= self.hash_counts(mover)  # Hash out the mover's reserve / captured counts before they change
             for item in range(num_items_to_remove):
                 temp_piece = self._board[tuple_to[0]][tuple_to[1]][item]
                 self.to_reserve(temp_piece, player)  # To remove this ###################???
+            self._hash ^= self.hash_counts(mover)
+            removed = self._board[tuple_to[0]][tuple_to[1]][:num_items_to_remove]
             self._board[tuple_to[0]][tuple_to[1]] = self._board[tuple_to[0]][tuple_to[1]][num_items_to_remove:]
+            return removed
+        return []
 
     def to_reserve(self, temp_piece, player):
         """
@@ -396,24 +801,323 @@ class FocusGame:
             else:
                 self._player_2.add_captured(temp_piece)
 
+    def undo(self):
+        """
+        Method undo, takes back the last move made by move_piece() or reserved_move(), including any pieces
+        it sent to reserve or captured, the turn and the game state.
+        :return: True if a move was taken back, False if there are no moves to undo
+        """
+        if self._history is None:
+            return False
+        self.unmake_move()
+        return True
+
+    def unmake_move(self):
+        """
+        Method unmake_move, reverses the last entry of the undo stack. The destination stack is rebuilt from the
+        pieces check_stack removed plus what is on the board now, then the moved pieces are split back off its top.
+        """
+        tuple_from, tuple_to, num_pieces, removed, turn, state, old_hash, self._history = self._history
+        mover = self._player_1 if turn == self._player_1.get_player() else self._player_2
+        self.count_stack(tuple_to, -1)
+        if tuple_from is not None:
+            self.count_stack(tuple_from, -1)
+        for piece in removed:  # Take back pieces to_reserve() handed to the mover
+            if piece == mover.get_player_color():
+                mover.subtract_reserve()
+            else:
+                mover.subtract_captured()
+        full_stack = removed + self._board[tuple_to[0]][tuple_to[1]]
+        self._board[tuple_to[0]][tuple_to[1]] = full_stack[:len(full_stack) - num_pieces]
+        if tuple_from is None:  # Reserve move, the piece goes back to the mover's reserve
+            mover.add_reserve(full_stack[-1])
+        else:
+            self._board[tuple_from[0]][tuple_from[1]] = self._board[tuple_from[0]][tuple_from[1]] + \
+                full_stack[len(full_stack) - num_pieces:]
+            self.count_stack(tuple_from, 1)
+            self.update_move_cache(tuple_from)
+        self.count_stack(tuple_to, 1)
+        self.update_move_cache(tuple_to)
+        self._turn = turn
+        self._current_state = state
+        self._hash = old_hash
+
     def switch_turns(self, player):
         """Method to change turns after a successful player move
         :param player: Player who made the move.
         """
+        self._hash ^= self._variant.zobrist_turn
         if player == self._player_1.get_player_name():
             self._turn = self._player_2.get_player()
         elif player == self._player_2.get_player_name():
             self._turn = self._player_1.get_player()
 
+    def update_move_cache(self, coords):
+        """
+        Method update_move_cache, looks up the cached moves for the stack at coords. The moves from a stack only
+        depend on its height, so only the cells changed by make_move / make_reserved_move need to be refreshed.
+        :param coords: Coordinates of the stack that changed
+        """
+        row, column = coords
+        self._move_cache[row][column] = self._variant.moves[row][column][len(self._board[row][column])]
+
+    def legal_moves(self, player):
+        """
+        Generator legal_moves, yields every move the player can make right now without calling validate_move.
+        Single and multiple moves are yielded as (tuple_from, tuple_to, num_pieces), reserve moves as (tuple_to,),
+        so each can be passed straight on as game.move_piece(player, *move) or game.reserved_move(player, *move).
+        Nothing is yielded if the game is over or it is not the player's turn.
+        :param player: Player name
+        """
+        if self._current_state != "UNFINISHED" or self._turn[0] != player:
+            return
+        for row, column in self._variant.cells:
+            stack = self._board[row][column]
+            if stack != [] and stack[-1] in self._turn:  # Topmost piece belongs to the player
+                yield from self._move_cache[row][column]
+        if self.show_reserve(player) > 0:
+            yield from self._variant.reserve_moves
+
+    def count_stack(self, coords, sign):
+        """
+        Method count_stack, adds (sign=1) or removes (sign=-1) the stack at coords from the controlled cell
+        counts. Called on each changed stack before and after a move. check_stack only trims pieces from the
+        bottom of a stack, which never changes its top piece, so it doesn't need to be counted again.
+        :param coords: Coordinates of the stack
+        :param sign: 1 or -1
+        """
+        stack = self._board[coords[0]][coords[1]]
+        if stack != []:
+            self._controlled[0 if stack[-1] == self._player_1.get_player_color() else 1] += sign
+
+    def hash_stack(self, coords):
+        """
+        Method hash_stack, XORs together the Zobrist keys of every piece of the stack at coords
+        :param coords: Coordinates of the stack
+        :return: 64-bit hash of the stack
+        """
+        variant = self._variant
+        keys = variant.zobrist_stack[coords[0] * variant.size + coords[1]]
+        color_1 = self._player_1.get_player_color()
+        result = 0
+        for level, piece in enumerate(self._board[coords[0]][coords[1]]):
+            result ^= keys[level][0 if piece == color_1 else 1]
+        return result
+
+    def hash_counts(self, player_object):
+        """
+        Method hash_counts, returns the Zobrist keys for a player's current reserve and captured counts
+        :param player_object: self._player_1 or self._player_2
+        """
+        index = 0 if player_object is self._player_1 else 1
+        return self._variant.zobrist_reserve[index][player_object.show_reserve()] ^ \
+            self._variant.zobrist_captured[index][player_object.show_captured()]
+
+    def compute_hash(self):
+        """
+        Method compute_hash, computes the Zobrist hash of the whole position from scratch: every stack,
+        both players' reserve and captured counts, and the side to move.
+        :return: 64-bit hash of the position
+        """
+        result = self.hash_counts(self._player_1) ^ self.hash_counts(self._player_2)
+        for coords in self._variant.cells:
+            result ^= self.hash_stack(coords)
+        if self._turn != self._player_1.get_player():
+            result ^= self._variant.zobrist_turn
+        return result
+
+    def set_recorder(self, recorder):
+        """
+        Method set_recorder, starts logging this game to a GameRecordWriter (FocusRecord.py). Every successful
+        move_piece() / reserved_move() is written to it, and the game record is ended when a player wins.
+        Moves taken back with undo() are not removed from the log, so don't search a game while it is recorded.
+        :param recorder: GameRecordWriter, or None to stop recording
+        """
+        self._recorder = recorder
+        if recorder is not None:
+            recorder.start_game(self._player_1.get_player(), self._player_2.get_player(), self._variant)
+
+    def set_stats(self, stats):
+        """
+        Method set_stats, turns instrumentation on or off (FocusStats.py). While on, validate_move, make_move,
+        make_reserved_move, check_stack and win_check are timed and counted into stats. The game is switched to
+        a subclass with the timed methods while on, so a game without stats runs no extra code at all.
+        :param stats: GameStats, or None to stop instrumenting
+        """
+        from FocusStats import instrumented_class  # Only needed once instrumentation is used
+        base = getattr(type(self), 'uninstrumented_class', type(self))
+        self._stats, self._last_check = stats, None
+        self.__class__ = base if stats is None else instrumented_class(base)
+
+    def clone(self):
+        """
+        Method clone, returns an independent copy of the game, including its undo stack. Moves never change a
+        stack list in place, they replace it with a new list, so the copy shares every stack and the undo stack with
+        this game (copy-on-write) and only the rows of references are copied. The copy is not recorded or
+        instrumented.
+        :return: New FocusGame
+        """
+        game = FocusGame.__new__(FocusGame)
+        game.__dict__.update(self.__dict__)
+        game._player_1 = self._player_1.clone()
+        game._player_2 = self._player_2.clone()
+        game._board = [list(row) for row in self._board]
+        game._move_cache = [list(row) for row in self._move_cache]
+        game._controlled = list(self._controlled)
+        game._recorder, game._stats = None, None
+        return game
+
+    def __getstate__(self):
+        """
+        Special method __getstate__, copy.deepcopy() and pickle store the undo stack as a list, oldest move first.
+        Copying the linked entries themselves would recurse once per move made. The move cache is left out, it only
+        holds references into the variant's move table and is cheaper to look up again than to copy.
+        """
+        state, entries, entry = dict(self.__dict__), [], self._history
+        del state['_move_cache']
+        while entry is not None:
+            entries.append(entry[:-1])
+            entry = entry[-1]
+        state['_history'] = entries[::-1]
+        return state
+
+    def __setstate__(self, state):
+        """Special method __setstate__, the reverse of __getstate__, links the undo stack entries again"""
+        self.__dict__.update(state)
+        self._history = None
+        for entry in state['_history']:
+            self._history = entry + (self._history,)
+        self._move_cache = [[()] * self._variant.size for row in range(self._variant.size)]
+        for coords in self._variant.cells:
+            self.update_move_cache(coords)
+
+    def snapshot(self):
+        """
+        Method snapshot, saves the current position to return to later with restore()
+        :return: Snapshot object (treat it as opaque, don't make moves on it)
+        """
+        return self.clone()
+
+    def restore(self, snapshot):
+        """
+        Method restore, puts the game back to a position saved by snapshot(). The same snapshot can be restored
+        more than once. The game's recorder and stats, if any, are kept.
+        :param snapshot: Value returned by snapshot()
+        """
+        recorder, stats = self._recorder, self._stats
+        self.__dict__.update(snapshot.clone().__dict__)
+        self._recorder, self._stats = recorder, stats
+
+    def to_bytes(self):
+        """
+        Method to_bytes, serializes the position: both player tuples, the board size, turn, game state,
+        reserve and captured counts, the variant's rules unless they are the defaults for the board size, then one
+        byte per cell (stack height + one bit per piece, as in FocusBitboard.py), or two bytes per cell on variants
+        with a stack limit over 5. The undo stack is not included.
+        :return: bytes
+        """
+        color_1 = self._player_1.get_player_color()
+        parts = []
+        for text in self._player_1.get_player() + self._player_2.get_player():
+            data = text.encode('utf-8')
+            parts.append(bytes([len(data)]) + data)
+        state = 0 if self._current_state == "UNFINISHED" else \
+            1 if self._current_state == self._player_1.get_player_name() + ' Won' else 2
+        variant = self._variant
+        if variant is not board_variant(variant.size):  # Flag the state byte and write the rules after the counts
+            state |= VARIANT_FLAG
+        parts.append(struct.pack('7B', len(self._board), 0 if self._turn == self._player_1.get_player() else 1,
+                                 state, self._player_1.show_reserve(), self._player_1.show_captured(),
+                                 self._player_2.show_reserve(), self._player_2.show_captured()))
+        if state & VARIANT_FLAG:
+            parts.append(encode_variant(variant))
+        cells = []
+        for row in self._board:
+            for stack in row:
+                bits = 0
+                for level, piece in enumerate(stack):
+                    bits |= (0 if piece == color_1 else 1) << level
+                cells.append(len(stack) | bits << 3)
+        if self._variant.stack_limit > 5:  # Taller stacks have more owner bits than fit in a byte
+            return b''.join(parts) + struct.pack('<%dH' % len(cells), *cells)
+        return b''.join(parts) + bytes(cells)
+
+    @classmethod
+    def from_bytes(cls, data, variant=None):
+        """
+        Method from_bytes, the reverse of to_bytes
+        :param data: bytes returned by to_bytes()
+        :param variant: BoardVariant the game was played on, only used for data written before to_bytes()
+                        stored the variant. Defaults to the standard rules for the board size.
+        :return: New FocusGame in the serialized position, with an empty undo stack
+        """
+        texts, position = [], 0
+        for index in range(4):
+            texts.append(data[position + 1:position + 1 + data[position]].decode('utf-8'))
+            position += 1 + data[position]
+        game = cls.__new__(cls)  # Skip __init__, every data member is set below
+        game._player_1, game._player_2 = Player((texts[0], texts[1])), Player((texts[2], texts[3]))
+        game._history, game._recorder, game._stats = None, None, None
+        size, turn, state, reserve_1, captured_1, reserve_2, captured_2 = struct.unpack_from('7B', data, position)
+        for player, reserve, captured, opponent in ((game._player_1, reserve_1, captured_1, game._player_2),
+                                                    (game._player_2, reserve_2, captured_2, game._player_1)):
+            player._reserve = [player.get_player_color()] * reserve
+            player._captured = [opponent.get_player_color()] * captured
+        colors = (texts[1], texts[3])
+        position += 7
+        if state & VARIANT_FLAG:
+            variant, position = read_variant(data, position, size)
+        game._variant = variant if variant is not None else board_variant(size)
+        cells = data[position:]
+        if game._variant.stack_limit > 5:  # Two bytes per cell
+            cells = struct.unpack('<%dH' % (size * size), cells)
+        game._board = [[[colors[(cell >> (3 + level)) & 1] for level in range(cell & 7)]
+                        for cell in cells[row * size:(row + 1) * size]] for row in range(size)]
+        game._turn = game._player_1.get_player() if turn == 0 else game._player_2.get_player()
+        state &= ~VARIANT_FLAG
+        game._current_state = "UNFINISHED" if state == 0 else texts[0 if state == 1 else 2] + ' Won'
+        game._move_cache = [[()] * size for row in range(size)]
+        game.rebuild_caches()
+        return game
+
+    def rebuild_caches(self):
+        """
+        Method rebuild_caches, recomputes everything derived from the board from scratch: the controlled counts,
+        the move cache and the Zobrist hash
+        """
+        self._controlled = [0, 0]
+        for coords in self._variant.cells:
+            self.count_stack(coords, 1)
+            self.update_move_cache(coords)
+        self._hash = self.compute_hash()
+
+    def get_players(self):
+        """Get method to return both player tuples, (tuple_1, tuple_2) in the order they were passed to __init__"""
+        return self._player_1.get_player(), self._player_2.get_player()
+
+    def get_turn(self):
+        """Get method to return the (name, color) tuple of the player whose turn it is"""
+        return self._turn
+
+    def get_current_state(self):
+        """Get method to return the game state: "UNFINISHED", or "<player name> Won" once a player has won"""
+        return self._current_state
+
+    def get_hash(self):
+        """Get method to return the Zobrist hash of the current position, kept up to date as moves are made"""
+        return self._hash
+
+    def get_variant(self):
+        """Get method to return the BoardVariant the game is played on"""
+        return self._variant
+
     def show_pieces(self, coords):
         """
         A method named `show_pieces` takes a position on the board and returns a list showing the pieces that are
         present at that location with the bottom-most pieces at the 0th index of the array and other pieces on
         it in ascending order.
         """
-        if coords[0] < 0 or coords[0] > len(self._board) - 1:
-            return "Invalid index"
-        elif coords[1] < 0 or coords[1] > len(self._board) - 1:
+        if tuple(coords) not in self._variant.cells:
             return "Invalid index"
         return self._board[coords[0]][coords[1]]
 
@@ -427,6 +1131,15 @@ class FocusGame:
         elif player_name == self._player_2.get_player_name():
             return self._player_2.show_reserve()
 
+    def show_controlled(self, player_name):
+        """
+        Takes the player name as the parameter and shows the number of stacks with that player's piece on top.
+        """
+        if player_name == self._player_1.get_player_name():
+            return self._controlled[0]
+        elif player_name == self._player_2.get_player_name():
+            return self._controlled[1]
+
     def show_captured(self, player_name):
         """
         Takes the player name as the parameter and shows the number of pieces captured by that player.
@@ -0,0 +1,133 @@
+# Description: Load generator for FocusServer. Opens many client connections, plays random games through the
+#              server and reports move latency percentiles. Also opens idle sessions to measure server memory.
+#
+# Usage: python FocusLoadTest.py --clients 100 --moves 200 --idle 5000
+#        python FocusLoadTest.py --variant square10   (play on a larger board, see FocusGame.VARIANTS)
+#        (starts a server in this process unless --port is given)
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+
+from FocusGame import FocusGame, VARIANTS
+from FocusServer import start_server, DEFAULT_HOST
+
+
+class Client:
+    """
+    Class definition for one load-test connection. It keeps a local FocusGame in step with the server's to pick
+    legal moves.
+    """
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    async def request(self, message):
+        """Sends one request and returns the decoded response"""
+        self._writer.write(json.dumps(message).encode('utf-8') + b'\n')
+        await self._writer.drain()
+        return json.loads(await self._reader.readline())
+
+    async def play(self, num_moves, rng, latencies, variant='standard'):
+        """
+        Method play, starts a game and plays up to num_moves random legal moves, both sides from this client
+        :param latencies: List the latency of every move request is appended to, in seconds
+        :param variant: Name of the board variant to play on (FocusGame.VARIANTS)
+        """
+        game_id = (await self.request({'op': 'new', 'variant': variant}))['game']
+        game = FocusGame(('PlayerA', 'R'), ('PlayerB', 'G'), VARIANTS[variant])
+        for index in range(num_moves):
+            player = game.get_turn()[0]
+            moves = list(game.legal_moves(player))
+            if moves == []:
+                break
+            move = rng.choice(moves)
+            message = {'op': 'reserve', 'game': game_id, 'player': player, 'to': move[0]} if len(move) == 1 else \
+                {'op': 'move', 'game': game_id, 'player': player, 'from': move[0], 'to': move[1], 'pieces': move[2]}
+            start = time.perf_counter()
+            response = await self.request(message)
+            latencies.append(time.perf_counter() - start)
+            if response['result'] != game.play_move(player, move):
+                raise AssertionError('server and local game disagree on %r' % (move,))
+        await self.request({'op': 'close', 'game': game_id})
+
+    async def close(self):
+        """Closes the connection"""
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+async def open_client(host, port):
+    """Opens a connection to the server"""
+    reader, writer = await asyncio.open_connection(host, port)
+    return Client(reader, writer)
+
+
+def percentile(values, fraction):
+    """Returns the value at the given fraction (0 to 1) of the sorted values"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def open_idle_sessions(host, port, count, variant='standard'):
+    """Opens count games on one connection and leaves them idle"""
+    client = await open_client(host, port)
+    for index in range(count):
+        await client.request({'op': 'new', 'variant': variant})
+    await client.close()
+
+
+async def run(host, port, clients, num_moves, idle, seed, variant='standard'):
+    """
+    Function run, drives the server with clients concurrent games and prints latency and throughput
+    """
+    in_process = port is None
+    if in_process:
+        tracemalloc.start()
+        focus_server, server = await start_server(host, 0)
+        port = server.sockets[0].getsockname()[1]
+    if idle:
+        before = tracemalloc.get_traced_memory()[0] if in_process else 0
+        await open_idle_sessions(host, port, idle, variant)
+        if in_process:
+            print('%d idle sessions: %.0f bytes per session' %
+                  (idle, (tracemalloc.get_traced_memory()[0] - before) / idle))
+    tracemalloc.stop()  # Memory tracing slows every allocation down, don't let it skew the latencies
+    connections = [await open_client(host, port) for index in range(clients)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client.play(num_moves, random.Random(seed + index), latencies, variant)
+                           for index, client in enumerate(connections)))
+    elapsed = time.perf_counter() - start
+    for client in connections:
+        await client.close()
+    print('%d moves from %d clients in %.2fs: %.0f moves/sec' % (len(latencies), clients, elapsed,
+                                                                   len(latencies) / elapsed))
+    print('move latency p50 %.2f ms, p99 %.2f ms' % (percentile(latencies, 0.5) * 1000,
+                                                      percentile(latencies, 0.99) * 1000))
+    if in_process:
+        while focus_server.connection_count() > 0:  # Let the server see every client disconnect
+            await asyncio.sleep(0.01)
+        server.close()
+        await server.wait_closed()
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Load test a FocusServer.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='server address')
+    parser.add_argument('--port', type=int, default=None, help='server port (default: start a server in process)')
+    parser.add_argument('--clients', type=int, default=100, help='concurrent connections playing games')
+    parser.add_argument('--moves', type=int, default=200, help='moves per game')
+    parser.add_argument('--idle', type=int, default=0, help='idle sessions to open first')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first client')
+    parser.add_argument('--variant', default='standard', choices=sorted(VARIANTS), help='board variant to play on')
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.host, args.port, args.clients, args.moves, args.idle, args.seed, args.variant))
+
+
+if __name__ == '__main__':
+    main()
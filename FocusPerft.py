@@ -0,0 +1,54 @@
+# Description: Perft (move path enumeration) for FocusGame. Walks every move sequence to a fixed depth, either by
+#              deep-copying the game before each move or with make/undo, and compares search throughput.
+
+import copy
+import time
+
+from FocusGame import FocusGame
+
+
+def perft_copy(game, player, opponent, depth):
+    """
+    Function perft_copy, counts the leaf positions depth moves ahead, deep-copying the game for every move
+    :return: Number of leaf positions
+    """
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in list(game.legal_moves(player)):
+        child = copy.deepcopy(game)
+        child.play_move(player, move)
+        nodes += perft_copy(child, opponent, player, depth - 1)
+    return nodes
+
+
+def perft_undo(game, player, opponent, depth):
+    """
+    Function perft_undo, counts the leaf positions depth moves ahead, making and undoing moves on a single game
+    :return: Number of leaf positions
+    """
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in list(game.legal_moves(player)):
+        game.play_move(player, move)
+        nodes += perft_undo(game, opponent, player, depth - 1)
+        game.undo()
+    return nodes
+
+
+def benchmark(depth=2):
+    """
+    Function benchmark, runs both perft versions from the starting position and prints nodes per second
+    :param depth: Search depth in moves
+    """
+    for name, function in (('deepcopy', perft_copy), ('make/undo', perft_undo)):
+        game = FocusGame(('PlayerA', 'R'), ('PlayerB', 'G'))
+        start = time.perf_counter()
+        nodes = function(game, 'PlayerA', 'PlayerB', depth)
+        elapsed = time.perf_counter() - start
+        print('%-10s depth %d: %8d nodes in %6.2fs, %9.0f nodes/sec' % (name, depth, nodes, elapsed, nodes / elapsed))
+
+
+if __name__ == '__main__':
+    benchmark()
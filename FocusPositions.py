@@ -0,0 +1,19 @@
+# Description: Test positions shared by the benchmark scripts, so a benchmark never has to import another one.
+
+import random
+
+from FocusGame import FocusGame
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+
+
+def midgame_position(num_moves=60, seed=0):
+    """Returns a FocusGame after num_moves random moves (fewer if the game ends first)"""
+    rng = random.Random(seed)
+    game = FocusGame(*PLAYERS)
+    for index in range(num_moves):
+        moves = list(game.legal_moves(game.get_turn()[0]))
+        if moves == []:
+            break
+        game.play_move(game.get_turn()[0], rng.choice(moves))
+    return game
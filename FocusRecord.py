@@ -0,0 +1,243 @@
+# Description: Compact binary game records for FocusGame, with a streaming writer and generator-based readers.
+#
+# File layout:
+#   b'FOCUSREC' + version byte, then any number of games, each:
+#     b'G', board size byte, then name 1, color 1, name 2, color 2 as a length byte + UTF-8 text,
+#     then one 2 byte big-endian word per move, then the 2 byte end marker 0x0000.
+#   Version 2: games on a variant other than the default rules for their board size have VARIANT_FLAG set in the
+#   board size byte, and the rules (see encode_variant() in FocusGame.py) right after it. Version 1 files, which
+#   only have the size, are still read.
+#   Move word: see encode_move() in FocusGame.py. Bit 15 reserve flag, bits 9-14 FROM cell, bits 3-8 TO cell,
+#   bits 0-2 number of pieces, cells numbered row * board size + column.
+#   Number of pieces is never 0 in a move, so the end marker can't be mistaken for one.
+
+import mmap
+import os
+import random
+import struct
+import tempfile
+import time
+
+from FocusGame import FocusGame, VARIANT_FLAG, board_variant, encode_variant, read_variant, encode_move, decode_move
+
+FILE_MAGIC = b'FOCUSREC\x02'
+FILE_MAGICS = (FILE_MAGIC, b'FOCUSREC\x01')  # Versions that can be read
+GAME_MAGIC = b'G'
+END_OF_GAME = b'\x00\x00'
+MOVE = struct.Struct('>H')
+
+
+def encode_header(tuple_1, tuple_2, variant):
+    """Returns the bytes of a game header: marker, board size, the rules if not the default ones, and both players"""
+    if variant is board_variant(variant.size):
+        parts = [GAME_MAGIC, bytes([variant.size])]
+    else:
+        parts = [GAME_MAGIC, bytes([variant.size | VARIANT_FLAG]), encode_variant(variant)]
+    for text in (tuple_1[0], tuple_1[1], tuple_2[0], tuple_2[1]):
+        data = text.encode('utf-8')
+        parts.append(bytes([len(data)]) + data)
+    return b''.join(parts)
+
+
+class GameRecordWriter:
+    """
+    Class definition for a streaming writer of game records. Attach it to a game with game.set_recorder(writer)
+    and every move made is written as it happens.
+    """
+    def __init__(self, file):
+        """
+        :param file: Binary file object opened for writing (or appending to a new file)
+        _in_game: True between start_game() and end_game()
+        """
+        self._file = file
+        self._in_game = False
+        self._file.write(FILE_MAGIC)
+
+    def start_game(self, tuple_1, tuple_2, variant=None):
+        """
+        Method start_game, writes a game header. An unfinished previous game is ended first.
+        :param variant: BoardVariant the game is played on, default standard. At most 8x8 (move words have 6 bits
+                        per cell).
+        """
+        variant = variant or board_variant()
+        if variant.size > 8:
+            raise ValueError('move words only fit boards up to 8x8')
+        self.end_game()
+        self._size = variant.size
+        self._file.write(encode_header(tuple_1, tuple_2, variant))
+        self._in_game = True
+
+    def write_move(self, move):
+        """Method write_move, writes one move in the form FocusGame.legal_moves() yields"""
+        self._file.write(MOVE.pack(encode_move(move, self._size)))
+
+    def end_game(self):
+        """Method end_game, writes the end of game marker. Does nothing if no game is open."""
+        if self._in_game:
+            self._file.write(END_OF_GAME)
+            self._in_game = False
+
+    def write_game(self, tuple_1, tuple_2, moves, variant=None):
+        """Method write_game, writes a whole game at once from a list of moves"""
+        self.start_game(tuple_1, tuple_2, variant)
+        self._file.write(b''.join(MOVE.pack(encode_move(move, self._size)) for move in moves))
+        self.end_game()
+
+
+def read_text(file):
+    """Reads one length byte + UTF-8 string from a file"""
+    return file.read(file.read(1)[0]).decode('utf-8')
+
+
+def read_games(file):
+    """
+    Generator read_games, reads a record file one game at a time, so memory use doesn't depend on the file size
+    :param file: Binary file object opened for reading
+    :return: Yields (tuple_1, tuple_2, BoardVariant, list of moves) for each game
+    """
+    if file.read(len(FILE_MAGIC)) not in FILE_MAGICS:
+        raise ValueError('not a FocusGame record file')
+    while file.read(1) == GAME_MAGIC:
+        size = file.read(1)[0]
+        if size & VARIANT_FLAG:
+            rules = file.read(4)
+            variant = read_variant(rules + file.read(rules[3]), 0, size & ~VARIANT_FLAG)[0]
+        else:
+            variant = board_variant(size)
+        size = variant.size
+        tuple_1 = (read_text(file), read_text(file))
+        tuple_2 = (read_text(file), read_text(file))
+        moves = []
+        word = file.read(2)
+        while word != END_OF_GAME and len(word) == 2:
+            moves.append(decode_move(MOVE.unpack(word)[0], size))
+            word = file.read(2)
+        yield tuple_1, tuple_2, variant, moves
+
+
+def record_variant(recorded, variant=None):
+    """
+    Function record_variant, the variant to replay a game record on
+    :param recorded: BoardVariant read from the record. Version 1 records only store the board size, so their
+                     variant is the default one for that size.
+    :param variant: BoardVariant to replay on instead, defaults to recorded. Only needed for version 1 records.
+    :return: BoardVariant, raises ValueError if variant doesn't fit the record
+    """
+    if variant is None or variant is recorded:
+        return recorded
+    if variant.size != recorded.size:
+        raise ValueError('record is for a %dx%d board, the variant is %dx%d' % (recorded.size, recorded.size,
+                                                                                 variant.size, variant.size))
+    if recorded is not board_variant(recorded.size):
+        raise ValueError('record is for another variant of the %dx%d board' % (recorded.size, recorded.size))
+    return variant
+
+
+def replay(tuple_1, tuple_2, moves, variant=None):
+    """
+    Generator replay, plays a recorded game move by move on a new FocusGame
+    :param variant: BoardVariant the game was played on, as read_games() yields it (default standard)
+    :return: Yields (game, move, result message) after each move, the same game object every time
+    """
+    game = FocusGame(tuple_1, tuple_2, variant)
+    for move in moves:
+        yield game, move, game.play_move(game.get_turn()[0], move)
+
+
+def replay_file(path, variant=None):
+    """
+    Generator replay_file, replays every game of a record file
+    :param variant: BoardVariant the games were played on, see record_variant()
+    :return: Yields the finished FocusGame of each game record
+    """
+    with open(path, 'rb') as file:
+        for tuple_1, tuple_2, recorded, moves in read_games(file):
+            game = FocusGame(tuple_1, tuple_2, record_variant(recorded, variant))
+            for move in moves:
+                game.play_move(game.get_turn()[0], move)
+            yield game
+
+
+def scan_records(buffer):
+    """
+    Generator scan_records, walks the games of a record file held in a bytes-like buffer (such as an mmap) without
+    decoding the moves
+    :return: Yields (tuple_1, tuple_2, BoardVariant, memoryview of the move words) for each game. The memoryview
+             is only valid until the next game is read.
+    """
+    if bytes(buffer[:len(FILE_MAGIC)]) not in FILE_MAGICS:
+        raise ValueError('not a FocusGame record file')
+    position = len(FILE_MAGIC)
+    while position < len(buffer) and buffer[position:position + 1] == GAME_MAGIC:
+        size, position = buffer[position + 1], position + 2
+        if size & VARIANT_FLAG:
+            variant, position = read_variant(buffer, position, size & ~VARIANT_FLAG)
+        else:
+            variant = board_variant(size)
+        texts = []
+        for index in range(4):
+            length = buffer[position]
+            texts.append(bytes(buffer[position + 1:position + 1 + length]).decode('utf-8'))
+            position += 1 + length
+        end = find_end_marker(buffer, position)
+        with memoryview(buffer)[position:end] as words:  # Released before the next game, so an mmap can close
+            yield (texts[0], texts[1]), (texts[2], texts[3]), variant, words
+        position = end + len(END_OF_GAME)
+
+
+def find_end_marker(buffer, start):
+    """Returns the offset of the end of game marker of the move words starting at start"""
+    end = buffer.find(END_OF_GAME, start)
+    while end != -1 and (end - start) % 2 == 1:  # Zero bytes across two move words, not a marker
+        end = buffer.find(END_OF_GAME, end + 1)
+    return end if end != -1 else len(buffer)
+
+
+def scan_archive(path):
+    """
+    Generator scan_archive, memory-maps a record file and walks its games with scan_records. The operating system
+    pages the file in as it is read, so multi-GB archives can be scanned without reading them into memory.
+    :return: Yields (tuple_1, tuple_2, BoardVariant, list of moves) for each game
+    """
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            records = scan_records(buffer)
+            try:
+                for tuple_1, tuple_2, variant, words in records:
+                    words = struct.unpack('>%dH' % (len(words) // 2), words)
+                    yield tuple_1, tuple_2, variant, [decode_move(word, variant.size) for word in words]
+            finally:
+                records.close()
+
+
+def benchmark(num_games=1000, max_moves=200, seed=0):
+    """
+    Function benchmark, records random games through set_recorder, then reports bytes per game and the
+    speed of replaying the file with replay_file and of scanning it with scan_archive
+    """
+    rng = random.Random(seed)
+    path = os.path.join(tempfile.mkdtemp(), 'games.focus')
+    total_moves = 0
+    with open(path, 'wb') as file:
+        writer = GameRecordWriter(file)
+        for index in range(num_games):
+            game = FocusGame(('PlayerA', 'R'), ('PlayerB', 'G'))
+            game.set_recorder(writer)
+            for move_number in range(max_moves):
+                if game.get_current_state() != "UNFINISHED":
+                    break
+                game.play_move(game.get_turn()[0], rng.choice(list(game.legal_moves(game.get_turn()[0]))))
+                total_moves += 1
+            writer.end_game()
+    print('%d games, %d moves: %.1f bytes per game, %.2f bytes per move' %
+          (num_games, total_moves, os.path.getsize(path) / num_games, os.path.getsize(path) / total_moves))
+    for name, function in (('replay_file', replay_file), ('scan_archive', scan_archive)):
+        start = time.perf_counter()
+        games = sum(1 for item in function(path))
+        elapsed = time.perf_counter() - start
+        print('%-12s %8.0f games/sec, %9.0f moves/sec' % (name, games / elapsed, total_moves / elapsed))
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    benchmark()
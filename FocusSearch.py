@@ -0,0 +1,324 @@
+# Description: Computer opponents for FocusGame. Iterative-deepening alpha-beta search and Monte Carlo tree search,
+#              both stopping at a wall-clock deadline. Moves are made with move_piece() / reserved_move() and taken
+#              back with undo(), so the search always follows the game's own rules.
+
+import math
+import random
+import time
+
+from FocusTransposition import TranspositionTable, EXACT, LOWER, UPPER
+
+WIN_SCORE = 100000   # Score of a won position, larger than any evaluation
+CHECK_EVERY = 256    # Number of nodes searched between deadline checks
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when the deadline has passed, to unwind back to the root"""
+    pass
+
+
+def opponent_name(game, player):
+    """Returns the name of the other player in the game"""
+    tuple_1, tuple_2 = game.get_players()
+    return tuple_2[0] if player == tuple_1[0] else tuple_1[0]
+
+
+def evaluate(game, player):
+    """
+    Function evaluate, scores a position from the point of view of player. Captured pieces count the most, then
+    reserve pieces, then the number of stacks each player controls (has the top piece of).
+    :param game: FocusGame to evaluate
+    :param player: Player name the score is for
+    :return: Score, positive if player is ahead
+    """
+    opponent = opponent_name(game, player)
+    controlled = game.show_controlled(player) - game.show_controlled(opponent)
+    captured = game.show_captured(player) - game.show_captured(opponent)
+    reserve = game.show_reserve(player) - game.show_reserve(opponent)
+    return 100 * captured + 30 * reserve + controlled
+
+
+def moves_if_unfinished(game):
+    """Returns the legal moves of the side to move, or an empty list if the game is over"""
+    if game.get_current_state() != "UNFINISHED":
+        return []
+    return list(game.legal_moves(game.get_turn()[0]))
+
+
+def order_moves(game, moves, best_move=None):
+    """
+    Function order_moves, sorts moves so the most promising are searched first: the best move from the
+    transposition table, then moves that overflow the destination stack (they capture), then taller moves,
+    with reserve moves last.
+    :return: New sorted list of moves
+    """
+    limit = game.get_variant().stack_limit
+
+    def key(move):
+        if move == best_move:
+            return -100
+        if len(move) == 1:
+            return 10
+        return -(len(game.show_pieces(move[1])) + move[2] > limit) * 10 - move[2]
+    return sorted(moves, key=key)
+
+
+class AlphaBetaSearch:
+    """
+    Class definition for an iterative-deepening negamax alpha-beta search with a transposition table.
+    The table is kept between searches so a bot can reuse it from move to move.
+    """
+    def __init__(self, table=None):
+        """
+        Special method __init__ to initialize private data members
+        :param table: TranspositionTable to use, a new one is made if None
+        """
+        self._table = table if table is not None else TranspositionTable()
+        self._deadline = 0.0
+        self._nodes = 0
+
+    def search(self, game, time_limit=0.2, max_depth=64):
+        """
+        Method search, finds the best move for the player whose turn it is, deepening one ply at a time until
+        time runs out. The result of the last fully searched depth is returned.
+        :param game: FocusGame to search. Moves are made on a clone, so its recorder and stats never see them.
+        :param time_limit: Seconds to search for, or None to always search to max_depth (the same move every time)
+        :param max_depth: Stop deepening at this depth even if there is time left
+        :return: (best move, stats dictionary with score, depth, nodes, time and nodes_per_sec). The move is None
+                 when the game is over or the side to move has no legal move.
+        """
+        start = time.perf_counter()
+        self._deadline = start + time_limit if time_limit is not None else float('inf')
+        self._nodes = 0
+        self._table.new_search()
+        game = game.clone()
+        best_move, best_score, depth_reached = None, 0, 0
+        moves = moves_if_unfinished(game)
+        if moves == []:
+            return None, self.make_stats(best_score, depth_reached, start)
+        for depth in range(1, max_depth + 1):
+            try:
+                best_move, best_score = self.search_root(game, depth, best_move)
+            except SearchTimeout:
+                break
+            depth_reached = depth
+            if abs(best_score) >= WIN_SCORE - max_depth:  # Forced win or loss found, no need to search deeper
+                break
+        if best_move is None:  # Not even depth 1 finished, fall back to the first ordered move
+            best_move = order_moves(game, moves)[0]
+        return best_move, self.make_stats(best_score, depth_reached, start)
+
+    def make_stats(self, score, depth, start):
+        """Returns the stats dictionary for a finished search"""
+        elapsed = time.perf_counter() - start
+        return {'score': score, 'depth': depth, 'nodes': self._nodes, 'time': elapsed,
+                'nodes_per_sec': self._nodes / elapsed if elapsed > 0 else 0.0}
+
+    def search_root(self, game, depth, previous_best):
+        """
+        Method search_root, searches every root move to depth, trying the previous iteration's best move first
+        :return: (best move, score)
+        """
+        player = game.get_turn()[0]
+        alpha, best_move = -WIN_SCORE - 1, None
+        for move in order_moves(game, list(game.legal_moves(player)), previous_best):
+            game.play_move(player, move)
+            try:
+                score = -self.negamax(game, depth - 1, -WIN_SCORE - 1, -alpha, 1)
+            finally:
+                game.undo()
+            if score > alpha:
+                alpha, best_move = score, move
+        return best_move, alpha
+
+    def negamax(self, game, depth, alpha, beta, ply):
+        """
+        Method negamax, alpha-beta search of the position from the side to move's point of view
+        :return: Score of the position
+        """
+        self._nodes += 1
+        if self._nodes % CHECK_EVERY == 0 and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        if game.get_current_state() != "UNFINISHED":
+            return -WIN_SCORE + ply  # The player who just moved won
+        player = game.get_turn()[0]
+        if depth == 0:
+            return evaluate(game, player)
+        entry = self._table.probe(game.get_hash())
+        if entry is not None and entry[0] >= depth:
+            if entry[2] == EXACT or (entry[2] == LOWER and entry[1] >= beta) or \
+                    (entry[2] == UPPER and entry[1] <= alpha):
+                return entry[1]
+        moves = list(game.legal_moves(player))
+        if moves == []:
+            return -WIN_SCORE + ply  # No move left to make
+        moves = order_moves(game, moves, entry and entry[3])
+        return self.search_moves(game, player, moves, depth, alpha, beta, ply)
+
+    def search_moves(self, game, player, moves, depth, alpha, beta, ply):
+        """
+        Method search_moves, the move loop of negamax. Stores the result in the transposition table.
+        :return: Score of the position
+        """
+        original_alpha, best_score, best_move = alpha, -WIN_SCORE - 1, None
+        for move in moves:
+            game.play_move(player, move)
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo()
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break  # Cutoff, the opponent won't allow this line
+        flag = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+        self._table.store(game.get_hash(), depth, best_score, flag, best_move)
+        return best_score
+
+
+class MCTSNode:
+    """
+    Class definition for a node of the Monte Carlo search tree
+    """
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, parent, untried):
+        """
+        :param move: Move that led to this node from its parent (None for the root)
+        :param parent: Parent MCTSNode (None for the root)
+        :param untried: Legal moves from this node not yet expanded
+        wins: Number of playouts won by the player who made move
+        """
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        """Returns the child with the highest UCT value"""
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits +
+                   exploration * math.sqrt(log_visits / child.visits))
+
+
+class MonteCarloSearch:
+    """
+    Class definition for a UCT Monte Carlo tree search. Playouts are random legal moves, cut off after
+    playout_limit moves and scored with evaluate().
+    """
+    def __init__(self, seed=None, exploration=1.4, playout_limit=40):
+        """
+        Special method __init__ to initialize private data members
+        :param seed: Seed for the random playouts, for repeatable searches
+        :param exploration: UCT exploration constant
+        :param playout_limit: Maximum number of moves in a random playout
+        """
+        self._random = random.Random(seed)
+        self._exploration = exploration
+        self._playout_limit = playout_limit
+
+    def search(self, game, time_limit=0.2, max_playouts=None):
+        """
+        Method search, runs playouts from the current position until time runs out
+        :param game: FocusGame to search. Moves are made on a clone, so its recorder and stats never see them.
+        :param time_limit: Seconds to search for, or None to stop only at max_playouts
+        :param max_playouts: Stop after this many playouts even if there is time left, at least one is always run.
+                             With time_limit None the search depends only on the seed, so it picks the same move
+                             every time.
+        :return: (most visited move, stats dictionary with playouts, nodes, depth, time and nodes_per_sec). The move
+                 is None when the game is over or the side to move has no legal move.
+        """
+        if time_limit is None and max_playouts is None:
+            raise ValueError('a search needs a time_limit or max_playouts to stop at')
+        start = time.perf_counter()
+        deadline = start + time_limit if time_limit is not None else float('inf')
+        game = game.clone()
+        root = MCTSNode(None, None, moves_if_unfinished(game))
+        playouts = nodes = depth_reached = 0
+        if root.untried == []:
+            return None, {'score': 0.0, 'depth': 0, 'playouts': 0, 'nodes': 0, 'time': time.perf_counter() - start,
+                          'nodes_per_sec': 0.0}
+        while playouts == 0 or time.perf_counter() < deadline and (max_playouts is None or playouts < max_playouts):
+            depth, moves_made = self.iterate(game, root)
+            playouts += 1
+            nodes += moves_made
+            depth_reached = max(depth_reached, depth)
+        best = max(root.children, key=lambda child: child.visits)
+        elapsed = time.perf_counter() - start
+        return best.move, {'score': best.wins / best.visits, 'depth': depth_reached, 'playouts': playouts,
+                           'nodes': nodes, 'time': elapsed, 'nodes_per_sec': nodes / elapsed if elapsed > 0 else 0.0}
+
+    def iterate(self, game, root):
+        """
+        Method iterate, one round of selection, expansion, playout and backpropagation. Every move made on the
+        game is undone before returning.
+        :return: (depth of the expanded node, number of moves made)
+        """
+        node, made = root, 0
+        while node.untried == [] and node.children != []:  # Selection
+            node = node.select_child(self._exploration)
+            game.play_move(game.get_turn()[0], node.move)
+            made += 1
+        if node.untried != []:  # Expansion
+            move = node.untried.pop(self._random.randrange(len(node.untried)))
+            game.play_move(game.get_turn()[0], move)
+            made += 1
+            node.children.append(MCTSNode(move, node, moves_if_unfinished(game)))
+            node = node.children[-1]
+        depth = made
+        winner, playout_moves = self.playout(game)
+        made += playout_moves
+        for index in range(made):
+            game.undo()
+        self.backpropagate(game, node, winner)
+        return depth, made
+
+    def playout(self, game):
+        """
+        Method playout, plays random legal moves until the game ends or the playout limit is reached
+        :return: (name of the winning player, number of moves made)
+        """
+        made = 0
+        while made < self._playout_limit and game.get_current_state() == "UNFINISHED":
+            player = game.get_turn()[0]
+            moves = list(game.legal_moves(player))
+            if moves == []:
+                return opponent_name(game, player), made  # No move left to make
+            game.play_move(player, self._random.choice(moves))
+            made += 1
+        if game.get_current_state() != "UNFINISHED":
+            return game.get_current_state()[:-len(' Won')], made
+        player = game.get_turn()[0]
+        return (player if evaluate(game, player) > 0 else opponent_name(game, player)), made
+
+    def backpropagate(self, game, node, winner):
+        """
+        Method backpropagate, adds the playout result to node and its ancestors. The game has already been
+        restored to the root position, so the mover at each node is worked out from the root's side to move.
+        """
+        players = [game.get_turn()[0], opponent_name(game, game.get_turn()[0])]
+        path = []
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        for depth, current in enumerate(reversed(path)):
+            current.visits += 1
+            if depth > 0 and players[(depth - 1) % 2] == winner:  # The root's side to move made the first move
+                current.wins += 1
+
+
+def best_move(game, time_limit=0.2, method='alphabeta'):
+    """
+    Function best_move, searches the current position with a fresh search object
+    :param game: FocusGame, its side to move is the player searched for
+    :param time_limit: Seconds to search for
+    :param method: 'alphabeta' or 'mcts'
+    :return: (best move, stats dictionary). The move can be passed to game.play_move(player, move), it is None if
+             there is no move to make.
+    """
+    if method == 'mcts':
+        return MonteCarloSearch().search(game, time_limit)
+    return AlphaBetaSearch().search(game, time_limit)
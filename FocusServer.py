@@ -0,0 +1,234 @@
+# Description: asyncio server hosting many FocusGame sessions over TCP. Each request and response is one line of JSON.
+#
+# Requests (the optional "id" is copied into the response):
+#   {"op": "new", "players": [["PlayerA", "R"], ["PlayerB", "G"]]}   -> {"ok": true, "game": "<game id>"}
+#       (optional "variant": a name from FocusGame.VARIANTS such as "cross", default "standard")
+#   {"op": "move", "game": id, "player": name, "from": [r, c], "to": [r, c], "pieces": n}
+#   {"op": "reserve", "game": id, "player": name, "to": [r, c]}      -> {"ok": true, "result": <move result>}
+#   {"op": "show", "game": id, "coords": [r, c]}                       -> {"ok": true, "pieces": [...]}
+#   {"op": "state", "game": id}                                      -> {"ok": true, "state": ..., "turn": ..., ...}
+#   {"op": "close", "game": id}                                      -> {"ok": true}
+# Errors are returned as {"ok": false, "error": "<message>"}. Games no request has named for --session-ttl seconds
+# (default one hour) are closed, after which their id is unknown.
+#
+# Usage: python -m FocusServer --port 8162
+#        python -m FocusServer --metrics-port 9162   (also serve FocusStats metrics at http://127.0.0.1:9162/metrics)
+
+import argparse
+import asyncio
+import json
+import secrets
+import time
+from collections import OrderedDict
+
+from FocusGame import FocusGame, VARIANTS
+from FocusStats import GameStats, serve_metrics
+
+DEFAULT_HOST = '127.0.0.1'  # Local connections only unless another host is given
+DEFAULT_PORT = 8162
+MAX_LINE = 4096             # Longest request line accepted, in bytes
+MAX_SESSIONS = 100000       # "new" requests are refused once this many games are open
+SESSION_TTL = 3600.0        # Seconds a game can go without requests before it is closed
+
+
+class Session:
+    """
+    Class definition for one hosted game. The lock is created on the first move, so idle sessions only hold
+    the game itself and the time it was last used.
+    """
+    __slots__ = ('game', 'lock', 'last_used')
+
+    def __init__(self, game):
+        self.game = game
+        self.lock = None
+        self.last_used = time.monotonic()
+
+    def get_lock(self):
+        """Returns the session's asyncio.Lock, creating it if needed"""
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        return self.lock
+
+
+class FocusServer:
+    """
+    Class definition for the game server: a registry of sessions keyed by game id, and the request handlers.
+    Moves in the same session are serialized by the session lock, whichever connection they come from.
+    Each connection is handled one request at a time and waits for its response to be sent before reading the
+    next one, so a client that doesn't read its responses is slowed down instead of filling up memory.
+    """
+    def __init__(self, max_sessions=MAX_SESSIONS, stats=None, session_ttl=SESSION_TTL):
+        """
+        :param max_sessions: Maximum number of open games
+        :param stats: Optional GameStats every game is instrumented with (FocusStats.py)
+        :param session_ttl: Seconds a game can go without requests before it is closed
+        _sessions: OrderedDict of game id: Session, least recently used first
+        _connections: Number of clients connected
+        """
+        self._sessions = OrderedDict()
+        self._connections = 0
+        self._max_sessions = max_sessions
+        self._stats = stats
+        self._session_ttl = session_ttl
+        self._handlers = {'new': self.op_new, 'move': self.op_move, 'reserve': self.op_reserve,
+                          'show': self.op_show, 'state': self.op_state, 'close': self.op_close}
+
+    async def handle_connection(self, reader, writer):
+        """Method handle_connection, reads request lines from one client until it disconnects"""
+        self._connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Line longer than MAX_LINE
+                    writer.write(b'{"ok": false, "error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                writer.write(json.dumps(await self.handle_line(line)).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    async def handle_line(self, line):
+        """
+        Method handle_line, decodes one request and dispatches it to its handler
+        :return: Response dictionary
+        """
+        request = None
+        self.close_idle_sessions()
+        try:
+            request = json.loads(line)
+            handler = self._handlers[request['op']]
+            response = await handler(request)
+        except (ValueError, KeyError, TypeError, IndexError) as error:
+            response = {'ok': False, 'error': 'bad request: %s' % error}
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def get_session(self, request):
+        """
+        Method get_session, finds the session named by the request's "game" and marks it used. It is moved to the
+        end of the registry, so the sessions stay in order of last use.
+        :return: Session, raises KeyError if there is none
+        """
+        session = self._sessions.get(request['game'])
+        if session is None:
+            raise KeyError('unknown game %r' % request['game'])
+        self._sessions.move_to_end(request['game'])
+        session.last_used = time.monotonic()
+        return session
+
+    def close_idle_sessions(self):
+        """
+        Method close_idle_sessions, closes the games that have had no requests for session_ttl seconds. Only the
+        least recently used sessions, at the start of the registry, are looked at.
+        :return: Number of games closed
+        """
+        oldest, closed = time.monotonic() - self._session_ttl, 0
+        while self._sessions and next(iter(self._sessions.values())).last_used <= oldest:
+            self._sessions.popitem(last=False)
+            closed += 1
+        return closed
+
+    async def op_new(self, request):
+        """Starts a new game and returns its id"""
+        if len(self._sessions) >= self._max_sessions:
+            return {'ok': False, 'error': 'too many games'}
+        players = request.get('players', (('PlayerA', 'R'), ('PlayerB', 'G')))
+        tuple_1, tuple_2 = ((str(player[0]), str(player[1])) for player in players)
+        variant = VARIANTS[request.get('variant', 'standard')]
+        game_id = secrets.token_hex(8)
+        game = FocusGame(tuple_1, tuple_2, variant)
+        if self._stats is not None:
+            game.set_stats(self._stats)
+        self._sessions[game_id] = Session(game)
+        return {'ok': True, 'game': game_id}
+
+    async def op_move(self, request):
+        """Calls move_piece() on the game"""
+        session = self.get_session(request)
+        async with session.get_lock():
+            result = session.game.move_piece(request['player'], tuple(request['from']), tuple(request['to']),
+                                             request['pieces'])
+        return {'ok': True, 'result': result}
+
+    async def op_reserve(self, request):
+        """Calls reserved_move() on the game"""
+        session = self.get_session(request)
+        async with session.get_lock():
+            result = session.game.reserved_move(request['player'], tuple(request['to']))
+        return {'ok': True, 'result': result}
+
+    async def op_show(self, request):
+        """Returns show_pieces() for one location"""
+        return {'ok': True, 'pieces': self.get_session(request).game.show_pieces(tuple(request['coords']))}
+
+    async def op_state(self, request):
+        """Returns the game state, whose turn it is, and both players' reserve and captured counts"""
+        game = self.get_session(request).game
+        players = game.get_players()
+        return {'ok': True, 'state': game.get_current_state(), 'turn': game.get_turn()[0],
+                'reserve': [game.show_reserve(player[0]) for player in players],
+                'captured': [game.show_captured(player[0]) for player in players]}
+
+    async def op_close(self, request):
+        """Removes a game from the registry"""
+        self.get_session(request)
+        del self._sessions[request['game']]
+        return {'ok': True}
+
+    def session_count(self):
+        """Returns the number of open games"""
+        return len(self._sessions)
+
+    def connection_count(self):
+        """Returns the number of connected clients"""
+        return self._connections
+
+
+async def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, max_sessions=MAX_SESSIONS, stats=None,
+                       session_ttl=SESSION_TTL):
+    """
+    Function start_server, starts listening for clients
+    :return: (FocusServer, asyncio.Server). Port 0 picks a free port, see server.sockets[0].getsockname().
+    """
+    focus_server = FocusServer(max_sessions, stats, session_ttl)
+    server = await asyncio.start_server(focus_server.handle_connection, host, port, limit=MAX_LINE)
+    return focus_server, server
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, max_sessions=MAX_SESSIONS, stats=None, session_ttl=SESSION_TTL):
+    """Function serve, runs the server until it is cancelled"""
+    focus_server, server = await start_server(host, port, max_sessions, stats, session_ttl)
+    print('FocusGame server listening on %s:%d' % server.sockets[0].getsockname()[:2])
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Host FocusGame sessions over line-delimited JSON.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='address to listen on (default: local only)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+    parser.add_argument('--max-sessions', type=int, default=MAX_SESSIONS, help='maximum number of open games')
+    parser.add_argument('--session-ttl', type=float, default=SESSION_TTL,
+                        help='close games with no requests for this many seconds')
+    parser.add_argument('--metrics-port', type=int, default=None, help='serve game metrics on this local port')
+    args = parser.parse_args(argv)
+    stats = None
+    if args.metrics_port is not None:
+        stats = GameStats()
+        serve_metrics(stats, port=args.metrics_port)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_sessions, stats, args.session_ttl))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+# Description: Batch FocusGame simulation. Plays random and bot-vs-bot games across a process pool and streams back
+#              one small result tuple per game. The search bots search to a fixed depth or number of playouts
+#              rather than for a time, so every game is the same on any machine and under any load.
+#
+# Usage: python -m FocusSimulate --games 10000 --workers 8 --bots random,random
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from FocusGame import FocusGame
+from FocusSearch import AlphaBetaSearch, MonteCarloSearch
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+DRAW = -1  # Winner value for games stopped at the move limit
+BOTS = ('random', 'alphabeta', 'mcts')
+SEARCH_DEPTH = 2  # Plies searched by the alphabeta bot
+PLAYOUTS = 20     # Playouts per move of the mcts bot
+
+
+def choose_move(game, player, bot, rng, depth=SEARCH_DEPTH, playouts=PLAYOUTS):
+    """
+    Function choose_move, picks the next move for a bot
+    :param game: FocusGame being played
+    :param player: Name of the player to move
+    :param bot: 'random', 'alphabeta' or 'mcts'
+    :param rng: random.Random of the game, so every game is repeatable from its seed
+    :param depth: Plies the alphabeta bot searches
+    :param playouts: Playouts per move of the mcts bot
+    :return: Move to pass to game.play_move(), or None if the player has no legal move
+    """
+    moves = list(game.legal_moves(player))
+    if moves == []:
+        return None
+    if bot == 'alphabeta':
+        return AlphaBetaSearch().search(game, None, depth)[0]
+    if bot == 'mcts':
+        return MonteCarloSearch(seed=rng.random(), playout_limit=20).search(game, None, playouts)[0]
+    return rng.choice(moves)
+
+
+def play_game(seed, bots=('random', 'random'), max_moves=1000, depth=SEARCH_DEPTH, playouts=PLAYOUTS):
+    """
+    Function play_game, plays one game to the end or to the move limit
+    :param seed: Seed for the game's random number generator
+    :param bots: Bot type for the first and second player
+    :param max_moves: Stop the game as a draw after this many moves
+    :param depth: Plies the alphabeta bot searches
+    :param playouts: Playouts per move of the mcts bot
+    :return: (seed, winner index 0/1 or DRAW, moves made, captured 1, captured 2, reserve 1, reserve 2)
+    """
+    rng = random.Random(seed)
+    game = FocusGame(*PLAYERS)
+    winner, moves_made = DRAW, 0
+    while moves_made < max_moves and game.get_current_state() == "UNFINISHED":
+        index = 0 if game.get_turn() == PLAYERS[0] else 1
+        move = choose_move(game, PLAYERS[index][0], bots[index], rng, depth, playouts)
+        if move is None:  # No move left to make, the other player wins
+            winner = 1 - index
+            break
+        game.play_move(PLAYERS[index][0], move)
+        moves_made += 1
+    if game.get_current_state() != "UNFINISHED":
+        winner = 0 if game.get_current_state() == PLAYERS[0][0] + ' Won' else 1
+    return (seed, winner, moves_made,
+            game.show_captured(PLAYERS[0][0]), game.show_captured(PLAYERS[1][0]),
+            game.show_reserve(PLAYERS[0][0]), game.show_reserve(PLAYERS[1][0]))
+
+
+def run_chunk(first_seed, count, bots, max_moves, depth, playouts):
+    """
+    Function run_chunk, the work unit run by each worker process: count games with seeds first_seed onward.
+    Only the result tuples are sent back to the parent process, never the games.
+    :return: List of play_game() result tuples
+    """
+    return [play_game(seed, bots, max_moves, depth, playouts) for seed in range(first_seed, first_seed + count)]
+
+
+def simulate(num_games, workers=None, chunk_size=100, seed=0, bots=('random', 'random'), max_moves=1000,
+             depth=SEARCH_DEPTH, playouts=PLAYOUTS):
+    """
+    Generator simulate, plays num_games games across a process pool and yields each result tuple as its chunk
+    finishes. Game i always uses seed + i, so results are the same whatever the number of workers; only the
+    order they arrive in changes. At most two chunks per worker are queued at a time to bound memory.
+    :param num_games: Number of games to play
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :param chunk_size: Number of games per work unit
+    :param seed: Seed of the first game
+    :param bots: Bot type for the first and second player: 'random', 'alphabeta' or 'mcts'
+    :param max_moves: Stop a game as a draw after this many moves
+    :param depth: Plies the alphabeta bot searches
+    :param playouts: Playouts per move of the mcts bot
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for first_seed in range(seed, seed + num_games, chunk_size):
+            count = min(chunk_size, seed + num_games - first_seed)
+            pending.add(executor.submit(run_chunk, first_seed, count, bots, max_moves, depth, playouts))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        for future in pending:
+            yield from future.result()
+
+
+def summarize(results):
+    """
+    Function summarize, totals a stream of result tuples without keeping them
+    :return: Dictionary of games, wins per player, draws, average moves, captured and reserve pieces
+    """
+    totals = {'games': 0, 'wins_1': 0, 'wins_2': 0, 'draws': 0, 'moves': 0, 'captured': 0, 'reserve': 0}
+    for seed, winner, moves_made, captured_1, captured_2, reserve_1, reserve_2 in results:
+        totals['games'] += 1
+        totals[{0: 'wins_1', 1: 'wins_2', DRAW: 'draws'}[winner]] += 1
+        totals['moves'] += moves_made
+        totals['captured'] += captured_1 + captured_2
+        totals['reserve'] += reserve_1 + reserve_2
+    totals['average_moves'] = totals['moves'] / totals['games'] if totals['games'] else 0.0
+    return totals
+
+
+def positive_int(text):
+    """
+    Function positive_int, the argparse type of counts that must be at least 1, such as --games and --chunk-size
+    :return: int
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected a whole number, got %r' % text) from None
+    if value < 1:
+        raise argparse.ArgumentTypeError('expected a number of at least 1, got %r' % text)
+    return value
+
+
+def bot_pair(text):
+    """
+    Function bot_pair, the argparse type of --bots: two bot names separated by a comma, each one of BOTS
+    :return: Tuple of the two bot names
+    """
+    bots = tuple(text.split(','))
+    if len(bots) != 2 or any(bot not in BOTS for bot in bots):
+        raise argparse.ArgumentTypeError('expected two of %s separated by a comma, got %r' % (', '.join(BOTS), text))
+    return bots
+
+
+def main(argv=None):
+    """Command line entry point, prints a summary of the simulated games"""
+    parser = argparse.ArgumentParser(description='Simulate FocusGame games across a process pool.')
+    parser.add_argument('--games', type=positive_int, default=1000, help='number of games to play')
+    parser.add_argument('--workers', type=positive_int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=positive_int, default=100, help='games per work unit')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--bots', default='random,random', type=bot_pair,
+                        help='bot types of the two players, each random, alphabeta or mcts')
+    parser.add_argument('--max-moves', type=int, default=1000, help='moves before a game is called a draw')
+    parser.add_argument('--depth', type=int, default=SEARCH_DEPTH, help='plies searched by the alphabeta bot')
+    parser.add_argument('--playouts', type=positive_int, default=PLAYOUTS, help='playouts per move of the mcts bot')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    totals = summarize(simulate(args.games, args.workers, args.chunk_size, args.seed,
+                                args.bots, args.max_moves, args.depth, args.playouts))
+    elapsed = time.perf_counter() - start
+    for key, value in totals.items():
+        print('%-14s %s' % (key, value))
+    print('%-14s %.1f' % ('games_per_sec', totals['games'] / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+# Description: Opt-in instrumentation for FocusGame: call counts and timing histograms of the hot paths, which
+#              check rejected each invalid move, and how many pieces were captured or sent to reserve.
+#
+# Turn it on per game with game.set_stats(stats); one GameStats can collect from any number of games. Games without
+# stats run exactly the same code as before: set_stats() switches the game to a subclass with the timed versions of
+# the methods, so nothing is checked on the normal path.
+#
+# stats.stats() returns a snapshot dictionary, stats.to_prometheus() the Prometheus text format, which can be written
+# to a file with write_prometheus() (e.g. for node_exporter's textfile collector) or served with serve_metrics().
+
+import bisect
+import http.server
+import os
+import threading
+import time
+
+from FocusGame import FocusGame, MOVED, NOT_YOUR_TURN, GAME_OVER, STATUS_NAMES
+
+TIMED_METHODS = ('validate_move', 'check_move', 'make_move', 'make_reserved_move', 'check_stack', 'win_check')
+VALIDATE_CHECKS = ('validate_args', 'validate_turn', 'validate_index_ranges', 'validate_has_reserve_in_stock',
+                   'validate_move_from_is_NOT_empty', 'validate_top_piece', 'validate_move_distance')
+# Rejection reasons: the validate_* check that rejected a validate_move() call, or the status code name
+# check_move() returned (move_piece(), reserved_move() and try_move() all validate through check_move, after
+# move_piece() and reserved_move() have checked their arguments with validate_args)
+REJECT_REASONS = VALIDATE_CHECKS + STATUS_NAMES[NOT_YOUR_TURN:]
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)  # Upper bounds, in seconds
+DEFAULT_METRICS_PORT = 9162
+
+
+class Histogram:
+    """
+    Class definition for a timing histogram with fixed buckets, in the layout Prometheus uses
+    """
+    def __init__(self):
+        """
+        _counts: Number of observations per bucket, the last one is everything above BUCKETS[-1]
+        """
+        self._counts = [0] * (len(BUCKETS) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, seconds):
+        """Method observe, adds one timing"""
+        self._counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self._sum += seconds
+        self._count += 1
+
+    def snapshot(self):
+        """
+        Method snapshot
+        :return: Dictionary of count, sum (seconds) and buckets: list of (upper bound, cumulative count)
+        """
+        buckets, total = [], 0
+        for bound, count in zip(BUCKETS + (float('inf'),), list(self._counts)):
+            total += count
+            buckets.append((bound, total))
+        return {'count': self._count, 'sum': self._sum, 'buckets': buckets}
+
+
+class GameStats:
+    """
+    Class definition for the collected statistics. Every counter and histogram exists from the start, so a
+    snapshot can be taken from another thread while games are being played.
+    """
+    def __init__(self):
+        """
+        _histograms: Dictionary of method name: Histogram
+        _rejected: Dictionary of rejection reason (see REJECT_REASONS): number of moves rejected for it
+        _pieces: Dictionary of 'captured' / 'reserved': number of pieces check_stack removed from the board
+        """
+        self._histograms = {name: Histogram() for name in TIMED_METHODS}
+        self._rejected = dict.fromkeys(REJECT_REASONS, 0)
+        self._pieces = {'captured': 0, 'reserved': 0}
+
+    def observe(self, name, seconds):
+        """Method observe, adds one timing of a method in TIMED_METHODS"""
+        self._histograms[name].observe(seconds)
+
+    def count_rejected(self, reason):
+        """Method count_rejected, counts an invalid move rejected for the given reason"""
+        self._rejected[reason] += 1
+
+    def count_pieces(self, captured, reserved):
+        """Method count_pieces, counts pieces removed from an overflowing stack"""
+        self._pieces['captured'] += captured
+        self._pieces['reserved'] += reserved
+
+    def stats(self):
+        """
+        Method stats, returns a snapshot of everything collected so far
+        :return: {'timings': {method: histogram snapshot}, 'rejected': {reason: count}, 'pieces': {...: count}}
+        """
+        return {'timings': {name: histogram.snapshot() for name, histogram in self._histograms.items()},
+                'rejected': dict(self._rejected), 'pieces': dict(self._pieces)}
+
+    def to_prometheus(self, prefix='focus'):
+        """Method to_prometheus, returns the snapshot in the Prometheus text exposition format"""
+        snapshot, lines = self.stats(), []
+        for name, timing in snapshot['timings'].items():
+            metric = '%s_%s_seconds' % (prefix, name)
+            lines.append('# HELP %s Time spent in FocusGame.%s' % (metric, name))
+            lines.append('# TYPE %s histogram' % metric)
+            for bound, count in timing['buckets']:
+                lines.append('%s_bucket{le="%s"} %d' % (metric, '+Inf' if bound == float('inf') else bound, count))
+            lines.append('%s_sum %r' % (metric, timing['sum']))
+            lines.append('%s_count %d' % (metric, timing['count']))
+        lines.append('# HELP %s_rejected_moves_total Moves rejected, by the check that failed' % prefix)
+        lines.append('# TYPE %s_rejected_moves_total counter' % prefix)
+        for reason, count in snapshot['rejected'].items():
+            lines.append('%s_rejected_moves_total{check="%s"} %d' % (prefix, reason, count))
+        lines.append('# HELP %s_pieces_removed_total Pieces removed from stacks over the limit, by where they went'
+                     % prefix)
+        lines.append('# TYPE %s_pieces_removed_total counter' % prefix)
+        for kind, count in snapshot['pieces'].items():
+            lines.append('%s_pieces_removed_total{to="%s"} %d' % (prefix, kind, count))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Method write_prometheus, writes to_prometheus() to a file, replacing it in one step"""
+        with open(path + '.tmp', 'w') as file:
+            file.write(self.to_prometheus())
+        os.replace(path + '.tmp', path)
+
+
+def instrumented_class(base):
+    """
+    Function instrumented_class, builds (once per class) the subclass of a game class whose methods are timed and
+    counted into the game's stats. FocusGame.set_stats() switches a game to it and back, so no wrapper is made per
+    game, and copies and pickles of an instrumented game stay instrumented.
+    :param base: FocusGame or a subclass of it
+    :return: Instrumented subclass of base
+    """
+    if base not in _instrumented:
+        methods = {'uninstrumented_class': base, '__doc__': 'Class definition for a %s with stats' % base.__name__}
+        for name in TIMED_METHODS:
+            methods[name] = timed(getattr(base, name), name)
+        for name in VALIDATE_CHECKS:
+            methods[name] = tracked(getattr(base, name), name)
+        methods['validate_args'] = argued(methods['validate_args'])
+        methods['validate_move'] = validated(methods['validate_move'])
+        methods['check_move'] = checked(methods['check_move'])
+        methods['try_move'] = routed(base.try_move)
+        methods['check_stack'] = counted(methods['check_stack'])
+        _instrumented[base] = type('Instrumented' + base.__name__, (base,), methods)
+    return _instrumented[base]
+
+
+def timed(method, name):
+    """Returns method wrapped to add its run time to the game's stats"""
+    def wrapper(game, *args, **kwargs):
+        start = time.perf_counter()
+        result = method(game, *args, **kwargs)
+        game._stats.observe(name, time.perf_counter() - start)
+        return result
+    return wrapper
+
+
+def tracked(method, name):
+    """Returns method wrapped to note it was the last validate_* check called, the one that rejects a move"""
+    def wrapper(game, *args, **kwargs):
+        game._last_check = name
+        return method(game, *args, **kwargs)
+    return wrapper
+
+
+def argued(method):
+    """Returns validate_args wrapped to count the moves it rejects, whether validate_move or move_piece called it"""
+    def wrapper(game, *args, **kwargs):
+        result = method(game, *args, **kwargs)
+        if result is False:
+            game._stats.count_rejected('validate_args')
+        return result
+    return wrapper
+
+
+def validated(method):
+    """Returns validate_move wrapped to count rejected moves by the check that rejected them"""
+    def wrapper(game, *args, **kwargs):
+        result = method(game, *args, **kwargs)
+        if result is False and game._last_check != 'validate_args':  # Those were counted by validate_args
+            game._stats.count_rejected(game._last_check)
+        elif result is not True and result is not False:
+            game._stats.count_rejected(STATUS_NAMES[GAME_OVER])
+        return result
+    return wrapper
+
+
+def checked(method):
+    """Returns check_move wrapped to count rejected moves by status code"""
+    def wrapper(game, *args, **kwargs):
+        status = method(game, *args, **kwargs)
+        if status != MOVED:
+            game._stats.count_rejected(STATUS_NAMES[status])
+        return status
+    return wrapper
+
+
+def routed(method):
+    """Returns try_move wrapped so move words are also validated by the instrumented check_move"""
+    def wrapper(game, move, player=None):
+        if move.__class__ is int:
+            status = game.check_move(move, player)
+            if status != MOVED:
+                return status
+        return method(game, move, player)
+    return wrapper
+
+
+def counted(method):
+    """Returns check_stack wrapped to count the pieces it captures and sends to reserve"""
+    def wrapper(game, tuple_to, player):
+        removed = method(game, tuple_to, player)
+        if removed:
+            tuple_1, tuple_2 = game.get_players()
+            color = tuple_1[1] if player == tuple_1[0] else tuple_2[1]
+            reserved = removed.count(color)
+            game._stats.count_pieces(len(removed) - reserved, reserved)
+        return removed
+    return wrapper
+
+
+_instrumented = {}  # Game class: its instrumented subclass
+InstrumentedFocusGame = instrumented_class(FocusGame)  # At module level so instrumented games can be pickled
+
+
+def serve_metrics(stats, host='127.0.0.1', port=DEFAULT_METRICS_PORT):
+    """
+    Function serve_metrics, serves stats.to_prometheus() at http://host:port/metrics from a background thread
+    :return: The http.server.ThreadingHTTPServer, call its shutdown() method to stop it
+    """
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = stats.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Don't print a line per scrape
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,368 @@
+# Description: Endgame tablebase for FocusGame. Every position with a few pieces left is solved exactly by
+#              retrograde analysis, and the results are written to a compact table that is memory-mapped to probe.
+#
+# Positions covered: at most `pieces` pieces on the board and in reserve together, at most `reserve` in each
+# player's reserve. With 5 or fewer pieces in play no stack can grow past 5, so nothing is ever captured or sent
+# to reserve again and every move stays inside the covered set. Captured counts then can't change the result,
+# and positions are keyed by their Zobrist hash with the captured counts left out.
+#
+# Table file: b'FOCUSTB1', then pieces, reserve and number of positions as little-endian uint32, then the position
+# keys as sorted uint64, then one uint16 per position: result in the top 2 bits, moves to the end in the rest.
+#
+# Usage: python -m FocusTablebase --output focus3.tb --pieces 3 --reserve 1 --workers 4
+
+import argparse
+import json
+import mmap
+import os
+import pickle
+import struct
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from FocusGame import FocusGame, STANDARD, ZOBRIST_CAPTURED
+
+MAGIC = b'FOCUSTB1'
+HEADER = struct.Struct('<8sIII')
+MAX_PIECES = 5  # More pieces than this could overflow a stack
+DRAW, WIN, LOSS = 0, 1, 2  # Results, for the player to move
+RESULT_NAMES = {DRAW: 'DRAW', WIN: 'WIN', LOSS: 'LOSS'}
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+BOARD_SIZE = 6
+
+
+def position_key(game):
+    """Returns the Zobrist hash of a game's position with both captured counts taken out"""
+    key = game.get_hash()
+    for index, (name, color) in enumerate(game.get_players()):
+        key ^= ZOBRIST_CAPTURED[index][game.show_captured(name)] ^ ZOBRIST_CAPTURED[index][0]
+    return key
+
+
+def boards(num_pieces):
+    """
+    Generator boards, yields the cells of every board with exactly num_pieces pieces, in a fixed order.
+    Each cell is a packed stack: height | one owner bit per piece << 3 (the to_bytes() cell format).
+    """
+    cells = bytearray(BOARD_SIZE * BOARD_SIZE)
+
+    def place(start, remaining):
+        if remaining == 0:
+            yield bytes(cells)
+            return
+        for cell in range(start, len(cells)):
+            for height in range(1, remaining + 1):
+                for bits in range(1 << height):
+                    cells[cell] = height | bits << 3
+                    yield from place(cell + 1, remaining - height)
+            cells[cell] = 0
+    yield from place(0, num_pieces)
+
+
+def positions(pieces, reserve):
+    """
+    Generator positions, yields every covered position as FocusGame.to_bytes() data, in a fixed order
+    :param pieces: Most pieces on the board and in reserve together
+    :param reserve: Most pieces in each player's reserve
+    """
+    header = FocusGame(*PLAYERS).to_bytes()[:-(BOARD_SIZE * BOARD_SIZE + 7)]
+    for on_board in range(pieces + 1):
+        for cells in boards(on_board):
+            for reserve_1 in range(min(reserve, pieces - on_board) + 1):
+                for reserve_2 in range(min(reserve, pieces - on_board - reserve_1) + 1):
+                    for turn in (0, 1):
+                        yield header + struct.pack('7B', BOARD_SIZE, turn, 0, reserve_1, 0, reserve_2, 0) + cells
+
+
+def expand_chunk(blobs):
+    """
+    Function expand_chunk, the work unit run by each worker: plays every legal move from each position with
+    move_piece() / reserved_move() and records where it leads
+    :param blobs: List of FocusGame.to_bytes() positions
+    :return: (keys, wins, offsets, successors) arrays. Position i has key keys[i], wins[i] is 1 if one of its
+             moves wins on the spot, and its successor keys are successors[offsets[i]:offsets[i + 1]].
+    """
+    keys, wins, offsets, successors = array('Q'), array('b'), array('L', [0]), array('Q')
+    for blob in blobs:
+        game = FocusGame.from_bytes(blob)
+        player = game.get_turn()[0]
+        keys.append(position_key(game))
+        won = 0
+        for move in list(game.legal_moves(player)):
+            game.play_move(player, move)
+            if game.get_current_state() != "UNFINISHED":
+                won = 1
+            successors.append(position_key(game))
+            game.undo()
+        wins.append(won)
+        offsets.append(len(successors))
+    return keys, wins, offsets, successors
+
+
+def chunk_path(work_dir, number):
+    """Returns the file name of a chunk's results"""
+    return os.path.join(work_dir, 'chunk_%06d.pickle' % number)
+
+
+def run_chunk(blobs, path):
+    """Function run_chunk, expands one chunk and saves it, written to a temporary file first so a crash
+    never leaves a partial chunk behind"""
+    with open(path + '.tmp', 'wb') as file:
+        pickle.dump(expand_chunk(blobs), file)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def chunks(pieces, reserve, chunk_size):
+    """Generator chunks, yields the covered positions in lists of chunk_size"""
+    chunk = []
+    for blob in positions(pieces, reserve):
+        chunk.append(blob)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def manifest_path(work_dir):
+    """Returns the file name of the parameters the chunks in work_dir were made with"""
+    return os.path.join(work_dir, 'manifest.json')
+
+
+def check_manifest(work_dir, pieces, reserve, chunk_size):
+    """
+    Function check_manifest, makes sure the chunks in work_dir were made with the same parameters before they are
+    reused, and records the parameters when starting a new work_dir. Chunk files are only numbered, so chunks
+    from another run would otherwise be silently mixed into the table.
+    :raises ValueError: if work_dir holds chunks from a run with other parameters, or with none recorded
+    """
+    manifest = {'format': MAGIC.decode('ascii'), 'pieces': pieces, 'reserve': reserve, 'chunk_size': chunk_size}
+    if os.path.exists(manifest_path(work_dir)):
+        with open(manifest_path(work_dir)) as file:
+            saved = json.load(file)
+        if saved != manifest:
+            raise ValueError('%s holds chunks made with %s, not %s; remove it to start again' % (work_dir, saved,
+                                                                                                 manifest))
+        return
+    if any(name.startswith('chunk_') for name in os.listdir(work_dir)):
+        raise ValueError('%s holds chunks with no record of their parameters; remove it to start again' % work_dir)
+    with open(manifest_path(work_dir) + '.tmp', 'w') as file:
+        json.dump(manifest, file)
+    os.replace(manifest_path(work_dir) + '.tmp', manifest_path(work_dir))
+
+
+def expand_all(work_dir, pieces, reserve, workers=None, chunk_size=5000):
+    """
+    Function expand_all, expands every covered position across a process pool. Chunks already saved in work_dir
+    by an earlier, interrupted run with the same parameters are skipped, so generation can be resumed (see
+    check_manifest()). At most two chunks per worker are queued at a time to bound memory.
+    :return: List of chunk file names, in position order
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    check_manifest(work_dir, pieces, reserve, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for number, blobs in enumerate(chunks(pieces, reserve, chunk_size)):
+            paths.append(chunk_path(work_dir, number))
+            if os.path.exists(paths[-1]):
+                continue
+            pending.add(executor.submit(run_chunk, blobs, paths[-1]))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        for future in pending:
+            future.result()
+    return paths
+
+
+def load_chunks(paths):
+    """
+    Function load_chunks, joins the saved chunks into one set of arrays
+    :return: (keys, wins, offsets, successors) for every position, like expand_chunk()
+    """
+    keys, wins, offsets, successors = array('Q'), array('b'), array('L', [0]), array('Q')
+    for path in paths:
+        with open(path, 'rb') as file:
+            chunk_keys, chunk_wins, chunk_offsets, chunk_successors = pickle.load(file)
+        keys.extend(chunk_keys)
+        wins.extend(chunk_wins)
+        offsets.extend(offset + len(successors) for offset in chunk_offsets[1:])
+        successors.extend(chunk_successors)
+    return keys, wins, offsets, successors
+
+
+def predecessors(edges, count):
+    """
+    Function predecessors, reverses the move graph
+    :param edges: array of successor indexes (-1 if unknown), grouped by position as in expand_chunk()
+    :param count: Number of positions
+    :return: (offsets, sources): the positions with a move to position i are sources[offsets[i]:offsets[i + 1]]
+    """
+    offsets = array('L', [0] * (count + 1))
+    for target in edges:
+        if target >= 0:
+            offsets[target + 1] += 1
+    for index in range(count):
+        offsets[index + 1] += offsets[index]
+    return offsets, array('l', [0] * offsets[count])
+
+
+def retrograde(keys, wins, offsets, successors):
+    """
+    Function retrograde, solves every position working backwards from the finished ones. A position is a WIN if
+    a move reaches a LOSS for the opponent, a LOSS if every move reaches a WIN for the opponent, and a DRAW if
+    neither can be forced.
+    :return: (results bytearray, distances array): result and number of moves to the end of each position
+    """
+    count = len(keys)
+    index = {key: number for number, key in enumerate(keys)}
+    edges = array('l', (index.get(key, -1) for key in successors))
+    pred_offsets, sources = predecessors(edges, count)
+    fill = array('L', pred_offsets)
+    results, distances, queue = bytearray(count), array('H', [0] * count), deque()
+    remaining = array('L', (offsets[number + 1] - offsets[number] for number in range(count)))
+    for number in range(count):
+        for edge in range(offsets[number], offsets[number + 1]):
+            if edges[edge] >= 0:
+                sources[fill[edges[edge]]] = number
+                fill[edges[edge]] += 1
+        if wins[number] or remaining[number] == 0:
+            results[number], distances[number] = (WIN, 1) if wins[number] else (LOSS, 0)
+            queue.append(number)
+    while queue:
+        number = queue.popleft()
+        for source in sources[pred_offsets[number]:pred_offsets[number + 1]]:
+            if results[source] == DRAW:
+                resolve(source, number, results, distances, remaining, queue)
+    return results, distances
+
+
+def resolve(source, target, results, distances, remaining, queue):
+    """Updates a position from one of its solved successors, queueing it if it is now solved"""
+    if results[target] == LOSS:
+        results[source], distances[source] = WIN, distances[target] + 1
+        queue.append(source)
+    else:
+        remaining[source] -= 1
+        if remaining[source] == 0:
+            results[source], distances[source] = LOSS, distances[target] + 1
+            queue.append(source)
+
+
+def write_table(path, pieces, reserve, keys, results, distances):
+    """Function write_table, writes the solved positions sorted by key"""
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    with open(path + '.tmp', 'wb') as file:
+        file.write(HEADER.pack(MAGIC, pieces, reserve, len(keys)))
+        file.write(array('Q', (keys[number] for number in order)).tobytes())
+        file.write(array('H', (results[number] << 14 | min(distances[number], 0x3FFF)
+                               for number in order)).tobytes())
+    os.replace(path + '.tmp', path)
+
+
+def generate(path, pieces=3, reserve=1, workers=None, chunk_size=5000):
+    """
+    Function generate, builds a tablebase file. Intermediate results are kept in path + '.work' until the table
+    is written, so an interrupted run picks up where it stopped when called again with the same arguments
+    (with other arguments it raises ValueError until the work directory is removed).
+    :param path: Table file to write
+    :param pieces: Most pieces on the board and in reserve together (5 at most)
+    :param reserve: Most pieces in each player's reserve
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :return: Number of positions in the table
+    """
+    if pieces > MAX_PIECES:
+        raise ValueError('tablebases cover at most %d pieces' % MAX_PIECES)
+    work_dir = path + '.work'
+    paths = expand_all(work_dir, pieces, reserve, workers, chunk_size)
+    keys, wins, offsets, successors = load_chunks(paths)
+    results, distances = retrograde(keys, wins, offsets, successors)
+    write_table(path, pieces, reserve, keys, results, distances)
+    for chunk in paths:
+        os.remove(chunk)
+    os.remove(manifest_path(work_dir))
+    os.rmdir(work_dir)
+    return len(keys)
+
+
+class Tablebase:
+    """
+    Class definition for a tablebase file opened for probing. The file is memory-mapped, so only the pages that
+    probes touch are read from disk.
+    """
+    def __init__(self, path):
+        """
+        :param path: File written by generate()
+        """
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._pieces, self._reserve, self._count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('not a FocusGame tablebase file')
+        self._values_start = HEADER.size + 8 * self._count
+
+    def covers(self, game):
+        """Returns True if the game is on the standard board and within the table's piece and reserve budget"""
+        if game.get_variant() is not STANDARD:
+            return False
+        on_board = sum(len(game.show_pieces((row, column))) for row in range(BOARD_SIZE)
+                       for column in range(BOARD_SIZE))
+        reserves = [game.show_reserve(name) for name, color in game.get_players()]
+        return game.get_current_state() == "UNFINISHED" and max(reserves) <= self._reserve and \
+            on_board + sum(reserves) <= self._pieces
+
+    def probe(self, game):
+        """
+        Method probe, looks up the game's position
+        :param game: FocusGame with two different colors
+        :return: ('WIN' / 'LOSS' / 'DRAW' for the player to move, moves to the end), or None if the position
+                 isn't covered by the table
+        """
+        if not self.covers(game):
+            return None
+        key = position_key(game)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from('<Q', self._map, HEADER.size + 8 * middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self._count or struct.unpack_from('<Q', self._map, HEADER.size + 8 * low)[0] != key:
+            return None
+        value = struct.unpack_from('<H', self._map, self._values_start + 2 * low)[0]
+        return RESULT_NAMES[value >> 14], value & 0x3FFF
+
+    def close(self):
+        """Method close, unmaps and closes the file"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Generate a FocusGame endgame tablebase.')
+    parser.add_argument('--output', required=True, help='table file to write')
+    parser.add_argument('--pieces', type=int, default=3, help='most pieces on the board and in reserve together')
+    parser.add_argument('--reserve', type=int, default=1, help='most pieces in each player\'s reserve')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='positions per work unit')
+    args = parser.parse_args(argv)
+    count = generate(args.output, args.pieces, args.reserve, args.workers, args.chunk_size)
+    print('%d positions written to %s' % (count, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# Description: Bounded transposition table for FocusGame positions, keyed by FocusGame.get_hash()
+
+EXACT = 0   # Stored value is the exact score of the position
+LOWER = 1   # Stored value is a lower bound (search failed high)
+UPPER = 2   # Stored value is an upper bound (search failed low)
+
+
+class TranspositionTable:
+    """
+    Class definition for a fixed-size transposition table. Each Zobrist hash maps to one slot (hash modulo the
+    number of slots). When two positions want the same slot, the deeper search result is kept, unless the entry
+    already there is left over from an earlier search, in which case it is always replaced.
+    """
+    def __init__(self, size=1 << 16):
+        """
+        Special method __init__ to initialize private data members
+        :param size: Number of slots, rounded up to a power of two
+        _mask: Bit mask turning a hash into a slot index
+        _entries: One (hash, depth, value, flag, move, generation) tuple or None per slot
+        _generation: Counter bumped by new_search() to age out old entries
+        """
+        slots = 1
+        while slots < size:
+            slots <<= 1
+        self._mask = slots - 1
+        self._entries = [None] * slots
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+
+    def store(self, key, depth, value, flag=EXACT, move=None):
+        """
+        Method store, saves a search result for a position following the replacement policy
+        :param key: Zobrist hash of the position
+        :param depth: Depth the position was searched to
+        :param value: Score of the position
+        :param flag: EXACT, LOWER or UPPER
+        :param move: Best move found from the position, if any
+        :return: True if the entry was stored, False if a deeper entry from this search was kept instead
+        """
+        index = key & self._mask
+        current = self._entries[index]
+        if current is not None and current[0] != key and current[5] == self._generation and current[1] > depth:
+            return False
+        self._entries[index] = (key, depth, value, flag, move, self._generation)
+        return True
+
+    def probe(self, key):
+        """
+        Method probe, looks up a position
+        :param key: Zobrist hash of the position
+        :return: (depth, value, flag, move) tuple, or None if the position isn't stored
+        """
+        entry = self._entries[key & self._mask]
+        if entry is None or entry[0] != key:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return entry[1:5]
+
+    def new_search(self):
+        """Method new_search, marks every stored entry as old so new results can replace them"""
+        self._generation += 1
+
+    def clear(self):
+        """Method clear, empties the table"""
+        self._entries = [None] * len(self._entries)
+        self._hits = 0
+        self._misses = 0
+
+    def get_stats(self):
+        """Get method to return a dictionary of table size, slots used, probe hits and probe misses"""
+        used = len(self._entries) - self._entries.count(None)
+        return {'size': len(self._entries), 'used': used, 'hits': self._hits, 'misses': self._misses}
@@ -0,0 +1,100 @@
+# Description: Micro-benchmark of FocusGame.win_check. Compares the old full-board scan with the counts kept
+#              up to date by make_move / make_reserved_move, in win checks per second and moves per second.
+
+import random
+import time
+
+from FocusGame import FocusGame
+
+
+class ScanWinFocusGame(FocusGame):
+    """
+    FocusGame with the original win_check, which builds a set of the top pieces of all 36 spaces after every move
+    """
+    def win_check(self, player):
+        """
+        Method to check for two win conditions:
+            1) The current player has 6 or more captured pieces
+            2) The game board only has one type of "piece" on the top of all occupied spaces.
+        :param player: Current player who made a  move
+        :return: True if win condition met
+        """
+        if self.show_captured(player) > 5:
+            return True
+        temp = set()
+        for row in self._board:
+            for item in row:
+                if item != []:
+                    temp.add(item[-1])
+        if len(temp) == 1:
+            return True
+
+
+def random_positions(count, seed=0):
+    """
+    Function random_positions, plays random games and keeps the position after every move
+    :return: List of (game, player who just moved) pairs, each game a separate copy
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        history = []
+        game = FocusGame(('PlayerA', 'R'), ('PlayerB', 'G'))
+        while game.get_current_state() == "UNFINISHED" and len(history) < 200 and len(positions) < count:
+            player = game.get_turn()[0]
+            move = rng.choice(list(game.legal_moves(player)))
+            game.play_move(player, move)
+            history.append((player, move))
+            positions.append((replay(FocusGame, history), player))
+    return positions
+
+
+def replay(game_class, history):
+    """Returns a new game_class game with the (player, move) history played on it"""
+    game = game_class(('PlayerA', 'R'), ('PlayerB', 'G'))
+    for player, move in history:
+        game.play_move(player, move)
+    return game
+
+
+def time_win_checks(positions, repeat=20):
+    """
+    Function time_win_checks, times the old scan and the new counted win_check on the same positions
+    :return: (old checks per second, new checks per second)
+    """
+    results = []
+    for check in (ScanWinFocusGame.win_check, FocusGame.win_check):
+        start = time.perf_counter()
+        for index in range(repeat):
+            for game, player in positions:
+                check(game, player)
+        results.append(len(positions) * repeat / (time.perf_counter() - start))
+    return tuple(results)
+
+
+def time_moves(game_class, num_games=200, seed=0):
+    """
+    Function time_moves, plays random games with game_class through move_piece() / reserved_move()
+    :return: Moves per second
+    """
+    rng = random.Random(seed)
+    moves_made, elapsed = 0, 0.0
+    for index in range(num_games):
+        game = game_class(('PlayerA', 'R'), ('PlayerB', 'G'))
+        while game.get_current_state() == "UNFINISHED" and moves_made < (index + 1) * 200:
+            player = game.get_turn()[0]
+            move = rng.choice(list(game.legal_moves(player)))
+            start = time.perf_counter()
+            game.play_move(player, move)
+            elapsed += time.perf_counter() - start
+            moves_made += 1
+    return moves_made / elapsed
+
+
+if __name__ == '__main__':
+    old_checks, new_checks = time_win_checks(random_positions(2000))
+    print('win_check, board scan: %10.0f checks/sec' % old_checks)
+    print('win_check, counts:     %10.0f checks/sec (%.1fx)' % (new_checks, new_checks / old_checks))
+    old_moves, new_moves = time_moves(ScanWinFocusGame), time_moves(FocusGame)
+    print('moves, board scan:     %10.0f moves/sec' % old_moves)
+    print('moves, counts:         %10.0f moves/sec (%.1fx)' % (new_moves, new_moves / old_moves))
@@ -0,0 +1,58 @@
+# Description: Tests for the follow queries of FocusAnalytics. A short hand-made game is replayed through
+#              analyze_game() with features that mark chosen moves, so the expected events and hits of each follow
+#              query can be counted by hand.
+#
+# Run with: python -m pytest test_FocusAnalytics.py (or python -m unittest test_FocusAnalytics)
+
+import unittest
+
+from FocusAnalytics import Summary, analyze_game
+from FocusGame import FocusGame, encode_move
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+NUM_MOVES = 8
+WITHIN = 2
+
+# Feature name: numbers of the moves (counted from 0) where it is nonzero
+MARKS = {'a': {0, 1}, 'b': {2, 3},  # Both pending events are followed at move 2, the hit at 3 has none left
+         'c': {4, 5},  # Move 5 follows move 4, but not itself
+         'd': {0, 5}, 'e': {3, 7}}  # Move 3 is 3 moves after 0, too late; move 7 is just within reach of 5
+FOLLOWS = {('a', 'b', WITHIN): (2, 2), ('c', 'c', WITHIN): (2, 1), ('d', 'e', WITHIN): (2, 1)}  # (events, hits)
+
+
+def hand_made_moves():
+    """
+    Function hand_made_moves, plays the first legal move not played before, NUM_MOVES times from the start
+    :return: List of the moves, all different so a feature can tell them apart
+    """
+    game, moves = FocusGame(*PLAYERS), []
+    for number in range(NUM_MOVES):
+        moves.append(next(move for move in sorted(game.legal_moves(game.get_turn()[0])) if move not in moves))
+        game.play_move(game.get_turn()[0], moves[-1])
+    return moves
+
+
+def marked(name, moves):
+    """Function marked, returns a feature extractor that is 1 on the moves MARKS gives the name, 0 elsewhere"""
+    return lambda game, move, mover, before, after: 1 if moves.index(move) in MARKS[name] else 0
+
+
+class TestFollowQueries(unittest.TestCase):
+    """
+    Class definition for the follow window of analyze_game()
+    """
+    def test_follow_window(self):
+        """Every pending event is credited with a hit, a move doesn't follow itself, old events are dropped"""
+        moves = hand_made_moves()
+        features = {name: marked(name, moves) for name in MARKS}
+        summary = Summary(features, FOLLOWS)
+        analyze_game(PLAYERS[0], PLAYERS[1], [encode_move(move) for move in moves], features, summary)
+        snapshot = summary.snapshot()
+        self.assertEqual((snapshot['games'], snapshot['moves'], snapshot['rejected']), (1, NUM_MOVES, 0))
+        for (first, then, within), (events, hits) in FOLLOWS.items():
+            follow = snapshot['follows']['%s->%s within %d' % (first, then, within)]
+            self.assertEqual((follow['events'], follow['hits']), (events, hits), (first, then))
+
+
+if __name__ == '__main__':
+    unittest.main()
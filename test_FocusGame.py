@@ -0,0 +1,265 @@
+# Description: Regression tests for FocusGame. Random games are played through the engine and checked move by move
+#              against a straightforward model of the rules that keeps no caches: legal moves, board, reserves,
+#              captured pieces and the winner, the Zobrist hash against compute_hash(), and undo, clone,
+#              snapshot/restore and try_move against replaying the same moves from the start. The board variants
+#              are checked against the same model and round-tripped through to_bytes().
+#
+# Run with: python -m pytest test_FocusGame.py (or python -m unittest test_FocusGame)
+
+import random
+import unittest
+
+from FocusBitboard import CompactFocusGame
+from FocusGame import FocusGame, MOVED, WON, STATUS_NAMES, STANDARD, VARIANTS, encode_move, decode_move
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+SIZE = 6
+STACK_LIMIT = 5
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+NUM_GAMES = 20
+VARIANT_GAMES = 5  # Per board variant, their games are longer
+MAX_MOVES = 1000  # Most random games end before this, so wins are checked too
+
+
+class ReferenceGame:
+    """
+    Class definition for the rules written out plainly: a dictionary of stacks, recounted from scratch whenever
+    anything is asked, so it can't share a bug with the engine's incremental caches
+    """
+    def __init__(self, variant=STANDARD):
+        """
+        Special method __init__, sets up the starting position: pairs of pieces alternating along each row of the
+        square margin cells in from the edge, the rest of the variant's cells empty
+        :param variant: BoardVariant, only its cells, margin, stack limit and captures to win are used
+        """
+        margin, inner = variant.margin, range(variant.margin, variant.size - variant.margin)
+        self.board = {(row, column): [PLAYERS[((column - margin) // 2 + row - margin) % 2][1]]
+                      if row in inner and column in inner else [] for row, column in variant.cells}
+        self.stack_limit, self.capture_win = variant.stack_limit, variant.capture_win
+        self.reserve = [0, 0]
+        self.captured = [0, 0]
+        self.turn = 0
+        self.winner = None
+
+    def legal_moves(self):
+        """Returns the set of moves the player to move can make, in the form FocusGame.legal_moves() yields"""
+        if self.winner is not None:
+            return set()
+        color, moves = PLAYERS[self.turn][1], set()
+        for (row, column), stack in self.board.items():
+            if stack != [] and stack[-1] == color:
+                for num_pieces in range(1, len(stack) + 1):
+                    for row_step, column_step in DIRECTIONS:
+                        tuple_to = (row + row_step * num_pieces, column + column_step * num_pieces)
+                        if tuple_to in self.board:
+                            moves.add(((row, column), tuple_to, num_pieces))
+        if self.reserve[self.turn] > 0:
+            moves.update((coords,) for coords in self.board)
+        return moves
+
+    def play(self, move):
+        """Method play, makes a legal move, removes the bottom of an overflowing stack and decides the winner"""
+        player, color = self.turn, PLAYERS[self.turn][1]
+        if len(move) == 1:
+            tuple_to, pieces = move[0], [color]
+            self.reserve[player] -= 1
+        else:
+            tuple_from, tuple_to, num_pieces = move
+            pieces = self.board[tuple_from][-num_pieces:]
+            self.board[tuple_from] = self.board[tuple_from][:-num_pieces]
+        stack = self.board[tuple_to] + pieces
+        for piece in stack[:-self.stack_limit]:
+            if piece == color:
+                self.reserve[player] += 1
+            else:
+                self.captured[player] += 1
+        self.board[tuple_to] = stack[-self.stack_limit:]
+        self.turn = 1 - player
+        opponent = 1 - player
+        if self.captured[player] >= self.capture_win or \
+                (self.controlled(opponent) == 0 and self.reserve[opponent] == 0):
+            self.winner = player
+
+    def controlled(self, player):
+        """Returns the number of stacks topped by the player's piece"""
+        return sum(1 for stack in self.board.values() if stack != [] and stack[-1] == PLAYERS[player][1])
+
+
+def random_game(seed, variant=STANDARD):
+    """
+    Function random_game, plays random legal moves until the game ends or MAX_MOVES is reached
+    :return: List of the moves played, in the form legal_moves() yields
+    """
+    rng, game, moves = random.Random(seed), FocusGame(*PLAYERS, variant), []
+    while len(moves) < MAX_MOVES and game.get_current_state() == "UNFINISHED":
+        legal = sorted(game.legal_moves(game.get_turn()[0]))
+        if legal == []:
+            break
+        moves.append(rng.choice(legal))
+        game.play_move(game.get_turn()[0], moves[-1])
+    return moves
+
+
+def random_move(rng):
+    """Returns a move that may or may not be legal, in any of the forms move_piece() and try_move() accept"""
+    coords = (rng.randrange(-1, SIZE + 1), rng.randrange(-1, SIZE + 1))
+    if rng.random() < 0.2:
+        return (coords,)
+    return coords, (rng.randrange(-1, SIZE + 1), rng.randrange(-1, SIZE + 1)), rng.randrange(0, STACK_LIMIT + 2)
+
+
+# Malformed (method, arguments after the player) calls, which FocusGame rejects without raising
+MALFORMED = (('move_piece', ((0, 0),)), ('move_piece', ((0, 0), None, 1)), ('move_piece', ((0, 0, 0), (0, 1), 1)),
+             ('move_piece', ((0, 0), (0, 1), True)), ('move_piece', ((0.0, 0), (0, 1), 1)),
+             ('move_piece', ([0, 0], (0, 1), 1)), ('move_piece', ((0, 0), (0, 'x'), 1)),
+             ('move_piece', ((0, 0), (0, 1), 1.0)), ('reserved_move', (('a', 'b'),)), ('reserved_move', ((1.0, 2),)),
+             ('reserved_move', ((0, 0, 1),)), ('reserved_move', (None,)), ('reserved_move', ([0, 0],)))
+
+
+class TestFocusGame(unittest.TestCase):
+    """
+    Class definition for the differential tests: every seed is a different random game
+    """
+    def assert_same_position(self, game, reference):
+        """Method assert_same_position, compares everything the engine reports with the reference model"""
+        for coords, stack in reference.board.items():
+            self.assertEqual(game.show_pieces(coords), stack, coords)
+        for index, (name, color) in enumerate(PLAYERS):
+            self.assertEqual(game.show_reserve(name), reference.reserve[index])
+            self.assertEqual(game.show_captured(name), reference.captured[index])
+            self.assertEqual(game.show_controlled(name), reference.controlled(index))
+        state = "UNFINISHED" if reference.winner is None else PLAYERS[reference.winner][0] + ' Won'
+        self.assertEqual(game.get_current_state(), state)
+        self.assertEqual(game.get_turn(), PLAYERS[reference.turn])
+        self.assertEqual(game.get_hash(), game.compute_hash())
+
+    def check_reference(self, variant, num_games):
+        """Method check_reference, plays num_games random games on the variant against the reference model"""
+        for seed in range(num_games):
+            game, reference = FocusGame(*PLAYERS, variant), ReferenceGame(variant)
+            for move in random_game(seed, variant):
+                self.assertEqual(set(game.legal_moves(game.get_turn()[0])), reference.legal_moves())
+                result = game.move_piece(game.get_turn()[0], *move) if len(move) == 3 else \
+                    game.reserved_move(game.get_turn()[0], move[0])
+                reference.play(move)
+                self.assertEqual(result, 'successfully moved' if reference.winner is None else
+                                 PLAYERS[reference.winner][0] + ' Wins')
+                self.assert_same_position(game, reference)
+
+    def test_moves_match_reference(self):
+        """Legal moves, stacks, reserves, captures, the winner and the hash match the reference after every move"""
+        self.check_reference(STANDARD, NUM_GAMES)
+
+    def test_variants_match_reference(self):
+        """The same holds on the cross board and on larger square boards"""
+        for name in ('cross', 'square8', 'square10'):
+            with self.subTest(variant=name):
+                self.check_reference(VARIANTS[name], VARIANT_GAMES)
+
+    def test_to_bytes_keeps_variant(self):
+        """from_bytes(to_bytes()) comes back on the same variant and in the same position, midgame included"""
+        for name, variant in sorted(VARIANTS.items()):
+            game = FocusGame(*PLAYERS, variant)
+            for move in random_game(0, variant)[:40]:
+                game.play_move(game.get_turn()[0], move)
+            copy = FocusGame.from_bytes(game.to_bytes())
+            self.assertIs(copy.get_variant(), variant, name)
+            self.assertEqual(copy.to_bytes(), game.to_bytes(), name)
+            self.assertEqual(copy.get_hash(), game.get_hash(), name)
+            self.assertEqual(sorted(copy.legal_moves(copy.get_turn()[0])),
+                             sorted(game.legal_moves(game.get_turn()[0])), name)
+
+    def test_hash_identifies_position(self):
+        """Positions reached by different move orders have the same hash only if they are the same position"""
+        seen = {}
+        for seed in range(NUM_GAMES):
+            game = FocusGame(*PLAYERS)
+            for move in random_game(seed):
+                game.play_move(game.get_turn()[0], move)
+                seen.setdefault(game.get_hash(), set()).add(game.to_bytes())
+        self.assertTrue(all(len(positions) == 1 for positions in seen.values()))
+
+    def test_undo_restores_every_position(self):
+        """Undoing a game move by move goes back through exactly the positions it went through"""
+        for seed in range(NUM_GAMES):
+            game, positions = FocusGame(*PLAYERS), []
+            for move in random_game(seed):
+                positions.append((game.to_bytes(), game.get_hash(), sorted(game.legal_moves(game.get_turn()[0]))))
+                game.play_move(game.get_turn()[0], move)
+            for data, position_hash, legal in reversed(positions):
+                self.assertTrue(game.undo())
+                self.assertEqual((game.to_bytes(), game.get_hash()), (data, position_hash))
+                self.assertEqual(sorted(game.legal_moves(game.get_turn()[0])), legal)
+            self.assertFalse(game.undo())
+            self.assertEqual(game.to_bytes(), FocusGame(*PLAYERS).to_bytes())
+
+    def test_clone_and_snapshot_are_independent(self):
+        """A clone continues exactly like the original, and moves on either never show up in the other"""
+        rng = random.Random(0)
+        for seed in range(NUM_GAMES):
+            moves = random_game(seed)
+            split = rng.randrange(len(moves) + 1)
+            game = FocusGame(*PLAYERS)
+            for move in moves[:split]:
+                game.play_move(game.get_turn()[0], move)
+            before, clone, snapshot = game.to_bytes(), game.clone(), game.snapshot()
+            for move in moves[split:]:
+                clone.play_move(clone.get_turn()[0], move)
+            self.assertEqual(game.to_bytes(), before)
+            for move in moves[split:]:
+                game.play_move(game.get_turn()[0], move)
+            self.assertEqual(game.to_bytes(), clone.to_bytes())
+            self.assertEqual(game.get_hash(), clone.get_hash())
+            while clone.undo():  # The clone shares the original's undo stack up to split, and undoes all of it
+                pass
+            self.assertEqual(clone.to_bytes(), FocusGame(*PLAYERS).to_bytes())
+            game.restore(snapshot)
+            self.assertEqual(game.to_bytes(), before)
+
+    def test_try_move_matches_validate_move(self):
+        """try_move accepts exactly the moves validate_move accepts, for tuples and move words alike"""
+        rng = random.Random(1)
+        for seed in range(NUM_GAMES):
+            game = FocusGame(*PLAYERS)
+            for move in random_game(seed):
+                for trial in range(5):
+                    candidate, player = random_move(rng), PLAYERS[rng.randrange(2)][0]
+                    expected = game.validate_move(player, *candidate) is True
+                    copy = game.clone()
+                    status = copy.try_move(candidate, player)
+                    self.assertEqual(status in (MOVED, WON), expected, (candidate, player, STATUS_NAMES[status]))
+                    if candidate in set(game.legal_moves(game.get_turn()[0])):
+                        word = encode_move(candidate)
+                        self.assertEqual(decode_move(word), candidate)
+                        self.assertEqual(game.clone().try_move(word, player), status)
+                game.play_move(game.get_turn()[0], move)
+
+    def test_compact_game_matches(self):
+        """CompactFocusGame (FocusBitboard.py) gives the same results and position as FocusGame, for invalid and
+        malformed moves too"""
+        rng = random.Random(2)
+        for seed in range(NUM_GAMES):
+            game, compact = FocusGame(*PLAYERS), CompactFocusGame(*PLAYERS)
+            for move in random_game(seed):
+                player = game.get_turn()[0]
+                for name, args in MALFORMED:
+                    self.assertEqual(getattr(compact, name)(player, *args), getattr(game, name)(player, *args),
+                                     (name, args))
+                candidate = random_move(rng)
+                if game.validate_move(player, *candidate) is not True:  # Only invalid ones, to stay on the game
+                    name = 'move_piece' if len(candidate) == 3 else 'reserved_move'
+                    self.assertEqual(getattr(compact, name)(player, *candidate),
+                                     getattr(game, name)(player, *candidate), candidate)
+                if len(move) == 1:
+                    self.assertEqual(compact.reserved_move(player, move[0]), game.reserved_move(player, move[0]))
+                else:
+                    self.assertEqual(compact.move_piece(player, *move), game.move_piece(player, *move))
+            for coords in ((row, column) for row in range(SIZE) for column in range(SIZE)):
+                self.assertEqual(compact.show_pieces(coords), game.show_pieces(coords))
+            for name, color in PLAYERS:
+                self.assertEqual(compact.show_reserve(name), game.show_reserve(name))
+                self.assertEqual(compact.show_captured(name), game.show_captured(name))
+
+
+if __name__ == '__main__':
+    unittest.main()
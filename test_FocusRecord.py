@@ -0,0 +1,89 @@
+# Description: Round-trip tests for FocusRecord. Seeded random games are recorded through FocusGame.set_recorder(),
+#              then read back with read_games(), scan_archive() and scan_records(), which must agree on every game,
+#              and replayed with replay_file(), which must reach the position each game ended in.
+#
+# Run with: python -m pytest test_FocusRecord.py (or python -m unittest test_FocusRecord)
+
+import io
+import os
+import random
+import struct
+import tempfile
+import unittest
+
+from FocusGame import FocusGame, VARIANTS, decode_move
+from FocusRecord import GameRecordWriter, read_games, scan_archive, scan_records, replay_file
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+NUM_GAMES = 10
+MAX_MOVES = 300  # Most games are cut off unfinished here, which records the same way as finished ones
+
+
+def record_games(file, variants):
+    """
+    Function record_games, plays one seeded random game per variant with a GameRecordWriter attached
+    :param file: Binary file object to write the records to
+    :param variants: List of BoardVariant, one per game
+    :return: List of (variant, moves played, to_bytes() of the last position) for each game
+    """
+    writer, games = GameRecordWriter(file), []
+    for seed, variant in enumerate(variants):
+        rng, game, moves = random.Random(seed), FocusGame(*PLAYERS, variant), []
+        game.set_recorder(writer)
+        while len(moves) < MAX_MOVES and game.get_current_state() == "UNFINISHED":
+            legal = sorted(game.legal_moves(game.get_turn()[0]))
+            if legal == []:
+                break
+            moves.append(rng.choice(legal))
+            game.play_move(game.get_turn()[0], moves[-1])
+        writer.end_game()
+        games.append((variant, moves, game.to_bytes()))
+    return games
+
+
+class TestFocusRecord(unittest.TestCase):
+    """
+    Class definition for the record round trips, on a file mixing the standard board with the 8x8 variants
+    """
+    def setUp(self):
+        """Method setUp, records the games to a temporary file"""
+        variants = [VARIANTS[name] for name in ('standard', 'cross', 'square8')] * (NUM_GAMES // 3 + 1)
+        handle, self.path = tempfile.mkstemp(suffix='.focus')
+        with os.fdopen(handle, 'wb') as file:
+            self.games = record_games(file, variants[:NUM_GAMES])
+
+    def tearDown(self):
+        """Method tearDown, removes the temporary file"""
+        os.remove(self.path)
+
+    def test_readers_agree(self):
+        """read_games, scan_archive and scan_records give every game's players, variant and moves as played"""
+        expected = [(PLAYERS[0], PLAYERS[1], variant, moves) for variant, moves, data in self.games]
+        with open(self.path, 'rb') as file:
+            self.assertEqual(list(read_games(file)), expected)
+        self.assertEqual(list(scan_archive(self.path)), expected)
+        with open(self.path, 'rb') as file:
+            buffer = file.read()
+        scanned = [(tuple_1, tuple_2, variant, [decode_move(word, variant.size) for word in
+                                                struct.unpack('>%dH' % (len(words) // 2), words)])
+                   for tuple_1, tuple_2, variant, words in scan_records(buffer)]
+        self.assertEqual(scanned, expected)
+
+    def test_replay_reaches_final_position(self):
+        """replay_file, given no variant, ends each game in the position it was recorded from"""
+        replayed = list(replay_file(self.path))
+        self.assertEqual(len(replayed), len(self.games))
+        for game, (variant, moves, data) in zip(replayed, self.games):
+            self.assertIs(game.get_variant(), variant)
+            self.assertEqual(game.to_bytes(), data)
+
+    def test_rejects_other_files(self):
+        """Data without the record file header is refused"""
+        with self.assertRaises(ValueError):
+            list(read_games(io.BytesIO(b'not a record file')))
+        with self.assertRaises(ValueError):
+            list(scan_records(b'not a record file'))
+
+
+if __name__ == '__main__':
+    unittest.main()